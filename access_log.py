@@ -0,0 +1,201 @@
+import atexit
+import json
+import queue
+import random
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from config import settings
+from metrics import UNMATCHED_ROUTE, format_labels, registry
+from query_stats import current_query_stats
+
+# ----------------------
+# Log de acceso estructurado (JSON por línea)
+# ----------------------
+# El hilo de la solicitud solo arma un dict y hace put_nowait en una cola
+# acotada; un hilo de fondo agrupa los registros y los escribe en lotes.
+# Si la cola está llena el registro se descarta (y se cuenta): el log nunca
+# frena una solicitud. Las respuestas exitosas se muestrean con
+# ACCESS_LOG_SAMPLE_RATE; errores y eventos de la aplicación siempre pasan.
+
+_context = ContextVar("access_log", default=None)
+
+
+@lru_cache(maxsize=1)
+def _orjson():
+    # Se importa al primer registro; opcional: mismo resultado con json estándar, solo más lento
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+def _encode(record: dict) -> str:
+    orjson = _orjson()
+    if orjson is not None:
+        return orjson.dumps(record, default=str).decode()
+    return json.dumps(record, default=str, ensure_ascii=False, separators=(",", ":"))
+
+
+class AccessLogWriter:
+    def __init__(self, stream, queue_size: int, batch_size: int, flush_seconds: float):
+        self.stream = stream
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.written = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, record: dict):
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="access-log", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            records = [record for record in batch if record is not None]
+            if records:
+                self._write(records)
+            if stop:
+                return
+
+    def _write(self, records):
+        try:
+            self.stream.write("".join(_encode(record) + "\n" for record in records))
+            self.stream.flush()
+            self.written += len(records)
+        except Exception:
+            self.dropped += len(records)
+
+    def close(self, timeout: float = 2.0):
+        # Vacía la cola al terminar el proceso
+        if self._thread is not None:
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                return
+            self._thread.join(timeout)
+            self._thread = None
+
+
+def _open_stream():
+    if settings.ACCESS_LOG_FILE:
+        return open(settings.ACCESS_LOG_FILE, "a", encoding="utf-8", buffering=1 << 16)
+    return sys.stdout
+
+
+writer = AccessLogWriter(
+    _open_stream(),
+    queue_size=settings.ACCESS_LOG_QUEUE_SIZE,
+    batch_size=settings.ACCESS_LOG_BATCH_SIZE,
+    flush_seconds=settings.ACCESS_LOG_FLUSH_SECONDS,
+)
+atexit.register(writer.close)
+
+
+def _collect():
+    return [
+        "# HELP access_log_records_total Registros de log por resultado.",
+        "# TYPE access_log_records_total counter",
+        f"access_log_records_total{format_labels(result='written')} {writer.written}",
+        f"access_log_records_total{format_labels(result='dropped')} {writer.dropped}",
+        f"access_log_records_total{format_labels(result='sampled_out')} {writer.sampled_out}",
+    ]
+
+
+registry.collectors.append(_collect)
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+
+
+def log_event(level: str, event: str, **fields):
+    # Eventos de la aplicación (reemplaza los print de las rutas); nunca se muestrean
+    record = {"ts": _now(), "level": level, "event": event, **fields}
+    context = _context.get()
+    if context is not None:
+        record.setdefault("request_id", context["request_id"])
+    writer.submit(record)
+
+
+def annotate(**fields):
+    # Agrega datos al registro de acceso de la solicitud actual (p. ej. user_id)
+    context = _context.get()
+    if context is not None:
+        context.update(fields)
+
+
+class AccessLogMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self._ids = iter(range(1, sys.maxsize))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.ACCESS_LOG:
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = 500
+        size = 0
+        context = {"request_id": next(self._ids)}
+        token = _context.set(context)
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _context.reset(token)
+            if status < 400 and settings.ACCESS_LOG_SAMPLE_RATE < 1 and random.random() >= settings.ACCESS_LOG_SAMPLE_RATE:
+                writer.sampled_out += 1
+            else:
+                stats = current_query_stats()
+                writer.submit({
+                    "ts": _now(),
+                    "level": "error" if status >= 500 else "warning" if status >= 400 else "info",
+                    "event": "request",
+                    "method": scope["method"],
+                    "route": getattr(scope.get("route"), "path", UNMATCHED_ROUTE),
+                    "path": scope["path"],
+                    "status": status,
+                    "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+                    "bytes": size,
+                    "queries": stats.count if stats is not None else None,
+                    "db_ms": round(stats.total * 1000, 2) if stats is not None else None,
+                    **context,
+                })
@@ -0,0 +1,197 @@
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# ----------------------
+# Generador determinista de un colegio sintético
+# ----------------------
+# Crea una base nueva (esquema vía migraciones) y la llena por lotes con
+# executemany: administradores, profesores, estudiantes, materias,
+# evaluaciones, matrículas y notas. La misma semilla produce exactamente los
+# mismos datos. Todos los usuarios comparten la contraseña BENCH_PASSWORD
+# (se hashea una sola vez).
+# Uso: python -m benchmarks.generate --database sqlite:///./bench.db --students 20000 --subjects 800 --seed 42
+
+BENCH_PASSWORD = "bench1234"
+BATCH_SIZE = 10000
+BASE_DATE = datetime(2025, 2, 3, 7, 0, 0)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Genera un colegio sintético para benchmarks")
+    parser.add_argument("--database", default="sqlite:///./bench.db")
+    parser.add_argument("--students", type=int, default=20000)
+    parser.add_argument("--teachers", type=int, default=400)
+    parser.add_argument("--admins", type=int, default=5)
+    parser.add_argument("--subjects", type=int, default=800)
+    parser.add_argument("--evaluations", type=int, default=10, help="evaluaciones por materia")
+    parser.add_argument("--enrollments", type=int, default=8, help="materias por estudiante")
+    parser.add_argument("--graded", type=float, default=0.9, help="fracción de evaluaciones ya calificadas")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--force", action="store_true", help="reemplaza la base si ya existe")
+    return parser.parse_args(argv)
+
+
+def _stamp(rng, days=120):
+    return BASE_DATE + timedelta(seconds=rng.randrange(days * 86400))
+
+
+def _people(rng, role, count, prefix, password):
+    for n in range(1, count + 1):
+        created = _stamp(rng)
+        yield {
+            "name": f"{role.value.capitalize()} {n}",
+            "email": f"{role.value}{n}@bench.schoolcontrol.edu",
+            "idnumber": f"{prefix}{n:09d}",
+            "password": password,
+            "role": role,
+            "age": rng.randint(14, 19) if prefix == "S" else rng.randint(25, 65),
+            "photo": None,
+            "active": True,
+            "created_at": created,
+            "updated_at": created,
+        }
+
+
+def _insert(conn, table, rows):
+    from sqlalchemy import insert
+
+    total = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            conn.execute(insert(table), batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        conn.execute(insert(table), batch)
+        total += len(batch)
+    return total
+
+
+def generate(args):
+    # La URL se fija antes de importar database: las engines se crean al importar
+    os.environ["DATABASE_URL"] = args.database
+    os.environ["AUTO_MIGRATE"] = "false"
+
+    from passlib.context import CryptContext
+    from sqlalchemy import select
+
+    import migrations
+    from config import settings
+    from database import engine
+    from grading import rebuild_final_grades
+    from models.enrollment import Enrollment
+    from models.evaluation import Evaluation
+    from models.grade import Grade
+    from models.subject import Subject
+    from models.user import User, UserRole
+
+    path = engine.url.database
+    if path and os.path.exists(path):
+        if not args.force:
+            sys.exit(f"✘ {path} ya existe; usa --force para reemplazarla")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    migrations.upgrade(engine)
+    password = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=settings.BCRYPT_ROUNDS).hash(BENCH_PASSWORD)
+
+    with engine.begin() as conn:
+        counts = {}
+        counts["admins"] = _insert(conn, User.__table__, _people(rng, UserRole.ADMIN, args.admins, "A", password))
+        counts["teachers"] = _insert(conn, User.__table__, _people(rng, UserRole.TEACHER, args.teachers, "T", password))
+        counts["students"] = _insert(conn, User.__table__, _people(rng, UserRole.STUDENT, args.students, "S", password))
+        teacher_ids = [row.id for row in conn.execute(select(User.id).where(User.role == UserRole.TEACHER).order_by(User.id))]
+        student_ids = [row.id for row in conn.execute(select(User.id).where(User.role == UserRole.STUDENT).order_by(User.id))]
+
+        def subjects():
+            for n in range(1, args.subjects + 1):
+                created = _stamp(rng, days=10)
+                yield {
+                    "name": f"Materia {n}",
+                    "description": f"Materia sintética {n}",
+                    "teacher_id": teacher_ids[(n - 1) % len(teacher_ids)] if teacher_ids else None,
+                    "created_at": created,
+                    "updated_at": created,
+                }
+
+        counts["subjects"] = _insert(conn, Subject.__table__, subjects())
+        subject_ids = [row.id for row in conn.execute(select(Subject.id).order_by(Subject.id))]
+
+        # Porcentajes enteros que suman 100
+        weights = [100 // args.evaluations] * args.evaluations
+        for i in range(100 - sum(weights)):
+            weights[i] += 1
+
+        def evaluations():
+            for subject_id in subject_ids:
+                for n, weight in enumerate(weights, start=1):
+                    created = _stamp(rng, days=10)
+                    yield {
+                        "name": f"Evaluación {n}",
+                        "description": None,
+                        "percentage": weight,
+                        "subject_id": subject_id,
+                        "created_at": created,
+                        "updated_at": created,
+                    }
+
+        counts["evaluations"] = _insert(conn, Evaluation.__table__, evaluations())
+        evaluations_of = {}
+        for evaluation_id, subject_id in conn.execute(select(Evaluation.id, Evaluation.subject_id).order_by(Evaluation.id)):
+            evaluations_of.setdefault(subject_id, []).append(evaluation_id)
+
+        per_student = min(args.enrollments, len(subject_ids))
+        enrolled = [(student_id, rng.sample(subject_ids, per_student)) for student_id in student_ids]
+
+        def enrollments():
+            for student_id, chosen in enrolled:
+                for subject_id in chosen:
+                    created = _stamp(rng, days=15)
+                    yield {
+                        "student_id": student_id,
+                        "subject_id": subject_id,
+                        "active": True,
+                        "enrolled_at": created,
+                        "updated_at": created,
+                    }
+
+        counts["enrollments"] = _insert(conn, Enrollment.__table__, enrollments())
+
+        def grades():
+            for student_id, chosen in enrolled:
+                for subject_id in chosen:
+                    for evaluation_id in evaluations_of.get(subject_id, []):
+                        if rng.random() >= args.graded:
+                            continue
+                        created = _stamp(rng)
+                        yield {
+                            "student_id": student_id,
+                            "evaluation_id": evaluation_id,
+                            "score": round(rng.uniform(1.0, 5.0), 1),
+                            "created_at": created,
+                            "updated_at": created,
+                        }
+
+        counts["grades"] = _insert(conn, Grade.__table__, grades())
+        rebuild_final_grades(conn)
+
+    # Estadísticas frescas para el planificador tras la carga masiva
+    with engine.connect() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    return counts, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    counts, elapsed = generate(arguments)
+    print(" ".join(f"{name}={count}" for name, count in counts.items()))
+    print(f"✔ Colegio sintético generado en {elapsed:.1f}s (semilla {arguments.seed}, contraseña '{BENCH_PASSWORD}')")
@@ -0,0 +1,200 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+# ----------------------
+# Benchmark de carga en proceso
+# ----------------------
+# Conduce la app por ASGI (httpx.ASGITransport, sin red ni servidor) con
+# usuarios virtuales concurrentes que eligen rol según la mezcla:
+#   - estudiantes: consultan sus notas, materias y evaluaciones
+#   - profesores: libro de notas y carga masiva de notas
+#   - administradores: listados paginados
+# Reporta por endpoint p50/p99, throughput y consultas SQL por solicitud
+# (header X-DB-Queries de query_stats). Escribe en la base: usar una copia
+# generada con benchmarks.generate. Requiere httpx (pip install -r requirements-dev.txt).
+# Uso: python -m benchmarks.load --database sqlite:///./bench.db --duration 30 --concurrency 20 --seed 7
+
+PAGE_LIMIT = 100
+BULK_GRADES = 20
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de carga en proceso")
+    parser.add_argument("--database", default="sqlite:///./bench.db")
+    parser.add_argument("--duration", type=float, default=30.0, help="segundos de carga")
+    parser.add_argument("--requests", type=int, default=0, help="detener tras N solicitudes en lugar de por duración")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--mix", default="student=60,teacher=25,admin=15")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", dest="json_path", help="guarda el resultado en JSON para comparar corridas")
+    return parser.parse_args(argv)
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))]
+
+
+class Population:
+    # Usuarios y relaciones necesarias para armar solicitudes válidas
+    def __init__(self):
+        from sqlalchemy import select
+
+        from database import read_engine
+        from models.enrollment import Enrollment
+        from models.evaluation import Evaluation
+        from models.subject import Subject
+        from models.user import User, UserRole
+
+        with read_engine.connect() as conn:
+            users = conn.execute(select(User.id, User.email, User.role).where(User.active == True)).all()
+            self.emails = {role: [email for _, email, r in users if r == role] for role in UserRole}
+            email_of = {user_id: email for user_id, email, _ in users}
+
+            self.subjects_of_student = {}
+            self.students_of_subject = {}
+            for student_id, subject_id in conn.execute(select(Enrollment.student_id, Enrollment.subject_id)):
+                self.subjects_of_student.setdefault(email_of.get(student_id), []).append(subject_id)
+                self.students_of_subject.setdefault(subject_id, []).append(student_id)
+
+            self.subjects_of_teacher = {}
+            for subject_id, teacher_id in conn.execute(select(Subject.id, Subject.teacher_id)):
+                if teacher_id in email_of:
+                    self.subjects_of_teacher.setdefault(email_of[teacher_id], []).append(subject_id)
+            self.evaluations_of = {}
+            for evaluation_id, subject_id in conn.execute(select(Evaluation.id, Evaluation.subject_id)):
+                self.evaluations_of.setdefault(subject_id, []).append(evaluation_id)
+        self.subject_ids = sorted(self.evaluations_of)
+
+        # Solo usuarios con algo que hacer
+        self.emails[UserRole.STUDENT] = [e for e in self.emails[UserRole.STUDENT] if e in self.subjects_of_student]
+        self.emails[UserRole.TEACHER] = [e for e in self.emails[UserRole.TEACHER] if e in self.subjects_of_teacher]
+
+
+def student_actions(rng, population, email):
+    subject_id = rng.choice(population.subjects_of_student[email])
+    return rng.choice([
+        ("GET /grades/", "GET", "/grades/", {"limit": PAGE_LIMIT}, None),
+        ("GET /final-grades/me", "GET", "/final-grades/me", None, None),
+        ("GET /subjects/", "GET", "/subjects/", {"limit": PAGE_LIMIT}, None),
+        ("GET /evaluations/subject/{subject_id}", "GET", f"/evaluations/subject/{subject_id}", None, None),
+        ("GET /grades/subject/{subject_id}", "GET", f"/grades/subject/{subject_id}", None, None),
+    ])
+
+
+def teacher_actions(rng, population, email):
+    subject_id = rng.choice(population.subjects_of_teacher[email])
+    action = rng.choice(["subjects", "gradebook", "bulk", "evaluations"])
+    if action == "subjects":
+        return ("GET /subjects/?fields=id,name", "GET", "/subjects/", {"limit": PAGE_LIMIT, "fields": "id,name"}, None)
+    if action == "gradebook":
+        return ("GET /subjects/{subject_id}/gradebook", "GET", f"/subjects/{subject_id}/gradebook", None, None)
+    if action == "bulk" and population.evaluations_of.get(subject_id) and population.students_of_subject.get(subject_id):
+        evaluation_id = rng.choice(population.evaluations_of[subject_id])
+        students = population.students_of_subject[subject_id]
+        chosen = rng.sample(students, min(BULK_GRADES, len(students)))
+        body = [{"student_id": student_id, "score": round(rng.uniform(1.0, 5.0), 1)} for student_id in chosen]
+        return ("POST /grades/evaluation/{evaluation_id}/bulk", "POST", f"/grades/evaluation/{evaluation_id}/bulk", None, body)
+    return ("GET /evaluations/subject/{subject_id}", "GET", f"/evaluations/subject/{subject_id}", None, None)
+
+
+def admin_actions(rng, population, email):
+    subject_id = rng.choice(population.subject_ids)
+    return rng.choice([
+        ("GET /users/students?fields=id,name,email", "GET", "/users/students", {"limit": PAGE_LIMIT, "fields": "id,name,email"}, None),
+        ("GET /subjects/?expand=teacher", "GET", "/subjects/", {"limit": PAGE_LIMIT, "expand": "teacher"}, None),
+        ("GET /enrollments/", "GET", "/enrollments/", {"limit": PAGE_LIMIT, "subject_id": subject_id}, None),
+        ("GET /grades/", "GET", "/grades/", {"limit": PAGE_LIMIT, "subject_id": subject_id}, None),
+    ])
+
+
+async def run(args):
+    import httpx
+
+    from main import app
+    from models.user import UserRole
+    from routes.users import create_access_token
+
+    population = Population()
+    roles = {"student": (UserRole.STUDENT, student_actions), "teacher": (UserRole.TEACHER, teacher_actions),
+             "admin": (UserRole.ADMIN, admin_actions)}
+    mix = []
+    for part in args.mix.split(","):
+        name, _, weight = part.partition("=")
+        role, actions = roles[name.strip()]
+        if population.emails[role]:
+            mix.append((role, actions, float(weight)))
+    tokens = {}
+
+    def headers_for(email):
+        if email not in tokens:
+            tokens[email] = {"Authorization": "Bearer " + create_access_token({"sub": email})}
+        return tokens[email]
+
+    samples = {}  # endpoint -> [(status, segundos, consultas)]
+    deadline = float("inf") if args.requests else time.perf_counter() + args.duration
+    remaining = [args.requests]
+
+    async def virtual_user(worker, client):
+        rng = random.Random(args.seed * 1000 + worker)
+        while time.perf_counter() < deadline:
+            if args.requests:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            role, actions, _ = rng.choices(mix, weights=[weight for *_, weight in mix])[0]
+            email = rng.choice(population.emails[role])
+            label, method, path, params, body = actions(rng, population, email)
+            start = time.perf_counter()
+            response = await client.request(method, path, params=params, json=body, headers=headers_for(email))
+            elapsed = time.perf_counter() - start
+            queries = int(response.headers.get("x-db-queries", 0))
+            samples.setdefault(label, []).append((response.status_code, elapsed, queries))
+
+    # ASGITransport no ejecuta el lifespan: se corre aquí para abrir y cerrar las engines (si no, las conexiones
+    # de aiosqlite que quedan en el pool impiden que el proceso termine)
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(virtual_user(i, client) for i in range(args.concurrency)))
+        wall = time.perf_counter() - started
+    return samples, wall
+
+
+def report(samples, wall):
+    rows = []
+    for label, values in sorted(samples.items()):
+        latencies = [elapsed for _, elapsed, _ in values]
+        rows.append({
+            "endpoint": label,
+            "requests": len(values),
+            "errors": sum(1 for status, _, _ in values if status >= 400),
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "rps": len(values) / wall,
+            "queries": sum(queries for _, _, queries in values) / len(values),
+        })
+    total = sum(row["requests"] for row in rows)
+    print(f"{'endpoint':<52}{'n':>7}{'err':>5}{'p50 ms':>9}{'p99 ms':>9}{'req/s':>8}{'sql/req':>9}")
+    for row in rows:
+        print(f"{row['endpoint']:<52}{row['requests']:>7}{row['errors']:>5}{row['p50_ms']:>9.1f}"
+              f"{row['p99_ms']:>9.1f}{row['rps']:>8.1f}{row['queries']:>9.1f}")
+    print(f"Total: {total} solicitudes en {wall:.1f}s -> {total / wall:.1f} req/s")
+    return {"wall_seconds": wall, "requests": total, "throughput": total / wall, "endpoints": rows}
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    # Antes de importar la app: base a medir y headers X-DB-* para contar consultas
+    os.environ["DATABASE_URL"] = arguments.database
+    os.environ["SQL_DEBUG_HEADERS"] = "true"
+    os.environ.setdefault("AUTO_MIGRATE", "false")
+    os.environ.setdefault("ACCESS_LOG", "false")  # el log de acceso a stdout se mezclaría con el reporte
+    result = report(*asyncio.run(run(arguments)))
+    if arguments.json_path:
+        with open(arguments.json_path, "w") as f:
+            json.dump(result, f, indent=2)
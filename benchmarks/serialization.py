@@ -0,0 +1,98 @@
+import sys
+import time
+from datetime import datetime, timedelta
+
+from pydantic import TypeAdapter
+
+from models.enrollment import Enrollment
+from models.evaluation import Evaluation
+from models.grade import Grade
+from models.subject import Subject
+from models.user import User, UserRole
+from routes.dtos import EnrollmentDto, EvaluationDto, GradeDto, SubjectDto, UserDto
+from routes.serialization import dumps, load_orjson, serializer
+
+# ----------------------
+# Benchmark de serialización por DTO
+# ----------------------
+# Compara la ruta de FastAPI (validar con from_attributes + dump_json de
+# pydantic) contra el serializador compilado, sobre un grafo ORM en memoria
+# (sin base de datos). Uso: python -m benchmarks.serialization [materias]
+
+
+def build_school(subjects=20, students_per_subject=30, evaluations_per_subject=5):
+    now = datetime(2025, 1, 1, 8, 0, 0)
+    stamp = dict(created_at=now, updated_at=now + timedelta(minutes=5))
+    ids = iter(range(1, 10**9))
+
+    def person(role, n):
+        return User(
+            id=next(ids), name=f"{role.value} {n}", email=f"{role.value}{n}@mail.com", idnumber=str(10**8 + n),
+            password="x", role=role, age=20 + n % 30, photo=None, active=True, **stamp
+        )
+
+    students = [person(UserRole.STUDENT, n) for n in range(students_per_subject)]
+    result = {Subject: [], Evaluation: [], Grade: [], Enrollment: [], User: list(students)}
+    for s in range(subjects):
+        teacher = person(UserRole.TEACHER, s)
+        result[User].append(teacher)
+        subject = Subject(id=next(ids), name=f"Materia {s}", description="Descripción", teacher=teacher, **stamp)
+        subject.enrollments = [
+            Enrollment(id=next(ids), student=student, active=True, enrolled_at=now, updated_at=now)
+            for student in students
+        ]
+        for enrollment in subject.enrollments:
+            enrollment.subject_id, enrollment.student_id = subject.id, enrollment.student.id
+        subject.teacher_id = teacher.id
+        for e in range(evaluations_per_subject):
+            evaluation = Evaluation(
+                id=next(ids), name=f"Evaluación {e}", description=None, percentage=20, subject=subject, **stamp
+            )
+            evaluation.subject_id = subject.id
+            evaluation.grades = [
+                Grade(id=next(ids), student=student, score=round(3 + (i % 20) / 10, 1), **stamp)
+                for i, student in enumerate(students)
+            ]
+            for grade in evaluation.grades:
+                grade.student_id, grade.evaluation_id = grade.student.id, evaluation.id
+            result[Evaluation].append(evaluation)
+            result[Grade].extend(evaluation.grades)
+        result[Subject].append(subject)
+        result[Enrollment].extend(subject.enrollments)
+    return result
+
+
+def _best(fn, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(subjects=20):
+    school = build_school(subjects)
+    cases = [
+        ("UserDto", User, UserDto),
+        ("SubjectDto", Subject, SubjectDto),
+        ("EvaluationDto", Evaluation, EvaluationDto),
+        ("GradeDto", Grade, GradeDto),
+        ("EnrollmentDto", Enrollment, EnrollmentDto),
+    ]
+    print(f"Codificador: {'orjson' if load_orjson() is not None else 'json'}")
+    print(f"{'DTO':<15}{'filas':>7}{'pydantic ms':>14}{'compilado ms':>15}{'aceleración':>13}")
+    for name, model, dto in cases:
+        rows = school[model]
+        adapter = TypeAdapter(list[dto])
+        fast = serializer(list[dto])
+        expected = adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+        if dumps(fast(rows)) != expected:
+            sys.exit(f"✘ {name}: la salida no coincide con la de pydantic")
+        slow_time = _best(lambda: adapter.dump_json(adapter.validate_python(rows, from_attributes=True)))
+        fast_time = _best(lambda: dumps(fast(rows)))
+        print(f"{name:<15}{len(rows):>7}{slow_time * 1000:>14.1f}{fast_time * 1000:>15.1f}{slow_time / fast_time:>12.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if sys.argv[1:] else 20)
@@ -0,0 +1,156 @@
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+import tempfile
+from functools import lru_cache
+
+from config import settings
+
+# ----------------------
+# Almacén de fotos direccionado por contenido
+# ----------------------
+# Cada archivo se guarda una sola vez bajo el sha256 de sus bytes
+# (PHOTO_STORAGE_DIR/ab/abcdef...); las miniaturas se generan al subir la foto
+# (abcdef..._<px>.jpg). Como el nombre depende del contenido, un archivo nunca
+# cambia y se puede cachear indefinidamente. En la base solo queda el hash.
+
+THUMBNAIL_SIZES = (64, 256)
+THUMBNAIL_QUALITY = 85
+DIGEST = re.compile(r"^[0-9a-f]{64}$")
+_DATA_URI = re.compile(r"^data:image/[\w.+-]+;base64,", re.IGNORECASE)
+
+# Firmas de los formatos aceptados
+MEDIA_TYPES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+
+@lru_cache(maxsize=1)
+def _pillow():
+    # Pillow se importa al subir la primera foto; es opcional: sin él no se generan miniaturas y se sirve el original
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+
+def sniff_media_type(head: bytes):
+    for signature, media_type in MEDIA_TYPES:
+        if head.startswith(signature):
+            return media_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+class InvalidPhoto(ValueError):
+    pass
+
+
+class BlobStore:
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, digest: str, size: int | None = None):
+        name = digest if size is None else f"{digest}_{size}.jpg"
+        return os.path.join(self.root, digest[:2], name)
+
+    def exists(self, digest: str):
+        return bool(DIGEST.match(digest)) and os.path.exists(self.path(digest))
+
+    def _write(self, path: str, data: bytes):
+        # Escritura atómica: un lector nunca ve un archivo a medias
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def put_photo(self, data: bytes) -> str:
+        if len(data) > settings.PHOTO_MAX_BYTES:
+            raise InvalidPhoto(f"La foto supera el máximo de {settings.PHOTO_MAX_BYTES} bytes")
+        if sniff_media_type(data[:12]) is None:
+            raise InvalidPhoto("Formato de imagen no soportado (PNG, JPEG, GIF o WebP)")
+        digest = hashlib.sha256(data).hexdigest()
+        if not os.path.exists(self.path(digest)):
+            thumbnails = self._thumbnails(data)
+            for size, thumbnail in thumbnails.items():
+                self._write(self.path(digest, size), thumbnail)
+            self._write(self.path(digest), data)
+        return digest
+
+    def _thumbnails(self, data: bytes):
+        Image = _pillow()
+        if Image is None:
+            return {}
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                image.load()
+                image = image.convert("RGB")
+        except (OSError, Image.DecompressionBombError) as e:
+            raise InvalidPhoto(f"Imagen inválida: {e}")
+        thumbnails = {}
+        for size in THUMBNAIL_SIZES:
+            thumbnail = image.copy()
+            thumbnail.thumbnail((size, size))
+            out = io.BytesIO()
+            thumbnail.save(out, "JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+            thumbnails[size] = out.getvalue()
+        return thumbnails
+
+    def open(self, digest: str, size: int | None = None):
+        # (ruta, tipo) del archivo a servir; sin miniatura se sirve el original
+        if size is not None:
+            path = self.path(digest, size)
+            if os.path.exists(path):
+                return path, "image/jpeg"
+        path = self.path(digest)
+        with open(path, "rb") as f:
+            return path, sniff_media_type(f.read(12)) or "application/octet-stream"
+
+
+def decode_inline_photo(value: str):
+    # Bytes de una foto enviada en línea (base64 o data URI); None si no lo es
+    raw = _DATA_URI.sub("", value.strip(), count=1)
+    try:
+        data = base64.b64decode(raw, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    return data if sniff_media_type(data[:12]) else None
+
+
+def store_photo_value(value: str | None):
+    # Normaliza el campo photo recibido en altas y actualizaciones:
+    # - vacío -> None
+    # - hash de una foto ya almacenada -> se conserva
+    # - imagen en base64 -> se guarda en el almacén y queda su hash
+    # - cualquier otro texto (URL externa) -> se conserva tal cual
+    if value is None or not value.strip():
+        return None
+    value = value.strip()
+    if DIGEST.match(value):
+        if not photo_store.exists(value):
+            raise InvalidPhoto("Foto no encontrada")
+        return value
+    data = decode_inline_photo(value)
+    if data is None:
+        if len(value) > settings.PHOTO_MAX_URL_LENGTH:
+            raise InvalidPhoto("La foto debe subirse con PUT /users/{id}/photo")
+        return value
+    return photo_store.put_photo(data)
+
+
+photo_store = BlobStore(settings.PHOTO_STORAGE_DIR)
@@ -0,0 +1,191 @@
+import threading
+import time
+from collections import OrderedDict
+
+# ----------------------
+# Caché en memoria acotada (LRU + TTL)
+# ----------------------
+
+
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
+
+
+# ----------------------
+# Caché de respuestas (bytes serializados)
+# ----------------------
+# Las entradas se invalidan por generaciones: cada etiqueta ("subject:3",
+# "users", ...) tiene un contador y la clave de una respuesta incluye los
+# contadores de sus etiquetas. Invalidar = incrementar el contador; las
+# entradas viejas quedan inalcanzables y salen por LRU/TTL. Así el mismo
+# esquema funciona en memoria y en un backend compartido entre workers.
+
+
+class ByteLRUCache:
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        self._data = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 and self.ttl > 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._data[key]
+                    self.size -= len(entry[1])
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value: bytes):
+        if not self.enabled or len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size -= len(old[1])
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._data.popitem(last=False)
+                self.size -= len(evicted)
+
+    def versions(self, tags):
+        with self._lock:
+            return [self._versions.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._data),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+            }
+
+
+class RedisCache:
+    # Backend compartido; la expulsión por tamaño la hace Redis (maxmemory-policy)
+    def __init__(self, url: str, ttl: float, prefix: str = "schoolcontrol:"):
+        import redis  # dependencia opcional, solo si se configura RESPONSE_CACHE_URL
+
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self._client = redis.Redis.from_url(url)
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def get(self, key):
+        value = self._client.get(self.prefix + "r:" + key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value: bytes):
+        if self.enabled:
+            self._client.set(self.prefix + "r:" + key, value, px=int(self.ttl * 1000))
+
+    def versions(self, tags):
+        if not tags:
+            return []
+        return [int(value or 0) for value in self._client.mget([self.prefix + "v:" + tag for tag in tags])]
+
+    def bump(self, tags):
+        pipe = self._client.pipeline()
+        for tag in tags:
+            pipe.incr(self.prefix + "v:" + tag)
+        pipe.execute()
+
+    def clear(self):
+        pass  # las entradas expiran solas; no se borra un espacio compartido
+
+    def stats(self):
+        return {"backend": "redis", "hits": self.hits, "misses": self.misses, "ttl": self.ttl}
+
+
+def make_response_cache(url: str | None, max_bytes: int, ttl: float):
+    if url:
+        return RedisCache(url, ttl)
+    return ByteLRUCache(max_bytes, ttl)
@@ -2,6 +2,18 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite:///./schoolcontrol.db" 
+    ASYNC_DATABASE_URL: str | None = None  # por defecto se deriva de DATABASE_URL
+    AUTO_MIGRATE: bool = True  # aplica migraciones pendientes al arrancar
+    STORAGE_PROFILE: str = "wal"  # "wal" o "default" (ver database.STORAGE_PROFILES)
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE: int = -65536  # negativo = KiB (64 MiB)
+    SQLITE_MMAP_SIZE: int = 268435456
+    DB_READ_POOL_SIZE: int = 8
+    DB_READ_MAX_OVERFLOW: int = 32
+    DB_WRITE_POOL_TIMEOUT: float = 30  # segundos que una escritura espera al único escritor
+    HOST: str = "0.0.0.0"
+    PORT: int = 8000
+    WEB_WORKERS: int = 0  # procesos de uvicorn; 0 = uno por núcleo
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440  
@@ -9,6 +21,31 @@ class Settings(BaseSettings):
     SMTP_PORT: int = 587
     SMTP_USERNAME: str = "your-email@gmail.com"
     SMTP_PASSWORD: str = "your-app-password"
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_SIZE: int = 32
+    PASSWORD_HASH_PROCESSES: int = 0  # importaciones masivas; 0 = un proceso por núcleo
+    BULK_CSV_MAX_BYTES: int = 10485760  # 10 MiB por archivo CSV
+    BULK_CSV_MAX_ROWS: int = 50000
+    PRINCIPAL_CACHE_SIZE: int = 1024
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60
+    ACCESS_SCOPE_CACHE_SIZE: int = 4096
+    ACCESS_SCOPE_CACHE_TTL_SECONDS: float = 30
+    RESPONSE_CACHE_MAX_BYTES: int = 33554432  # 32 MiB; 0 desactiva la caché de respuestas
+    RESPONSE_CACHE_TTL_SECONDS: float = 300
+    RESPONSE_CACHE_URL: str | None = None  # redis://... para compartir la caché entre workers
+    SQL_DEBUG_HEADERS: bool = False  # headers X-DB-* con el resumen de SQL de cada solicitud
+    SQL_N_PLUS_ONE_THRESHOLD: int = 10  # repeticiones de una sentencia para marcarla como N+1
+    SQL_SLOWEST_KEPT: int = 5
+    PHOTO_STORAGE_DIR: str = "./media"  # almacén de fotos por hash (ver blobs.py)
+    PHOTO_MAX_BYTES: int = 5242880  # 5 MiB
+    PHOTO_MAX_URL_LENGTH: int = 2048  # fotos por URL externa; las imágenes se suben aparte
+    ACCESS_LOG: bool = True  # log de acceso en JSON, una línea por solicitud
+    ACCESS_LOG_FILE: str | None = None  # por defecto stdout
+    ACCESS_LOG_SAMPLE_RATE: float = 1.0  # fracción de respuestas exitosas registradas; los errores siempre
+    ACCESS_LOG_QUEUE_SIZE: int = 10000  # con la cola llena los registros se descartan
+    ACCESS_LOG_BATCH_SIZE: int = 256
+    ACCESS_LOG_FLUSH_SECONDS: float = 1.0
     
     class Config:
         env_file = ".env"
@@ -1,15 +1,187 @@
-from sqlalchemy import create_engine
+import os
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from config import settings
 
-engine = create_engine(settings.DATABASE_URL)
+# Drivers asíncronos equivalentes a los síncronos de DATABASE_URL
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+# Perfiles de almacenamiento para SQLite: PRAGMAs aplicados a cada conexión.
+# "wal" permite lectores concurrentes mientras un único escritor hace commit.
+STORAGE_PROFILES = {
+    "default": {},
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        "cache_size": settings.SQLITE_CACHE_SIZE,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        "temp_store": "MEMORY",
+    },
+}
+
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+def get_async_database_url():
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    url = make_url(settings.DATABASE_URL)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+def install_sqlite_pragmas(engine, read_only=False):
+    pragmas = dict(STORAGE_PROFILES[settings.STORAGE_PROFILE])
+    if read_only:
+        # journal_mode es persistente y lo fija el escritor
+        pragmas.pop("journal_mode", None)
+        pragmas["query_only"] = "ON"
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+# INSERT ... ON CONFLICT del dialecto en uso; SQLite y PostgreSQL comparten la API
+# (on_conflict_do_update / on_conflict_do_nothing / excluded)
+UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+def upsert_insert(db, entity):
+    # `db` puede ser una Session o una Connection
+    dialect = db.dialect if hasattr(db, "dialect") else db.get_bind().dialect
+    if dialect.name not in UPSERT_DIALECTS:
+        raise NotImplementedError(f"INSERT ... ON CONFLICT no disponible para {dialect.name}")
+    return UPSERT_DIALECTS[dialect.name](entity)
+
+_url = make_url(settings.DATABASE_URL)
+_is_sqlite = _url.get_backend_name() == "sqlite"
+_is_memory = _is_sqlite and _url.database in (None, "", ":memory:")
+
+if _is_sqlite and not _is_memory:
+    # Un solo escritor: una conexión sin desborde. Las escrituras se serializan
+    # esperando el pool (DB_WRITE_POOL_TIMEOUT) en lugar de competir por el lock
+    # de SQLite y fallar con "database is locked".
+    engine = create_engine(
+        settings.DATABASE_URL,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=settings.DB_WRITE_POOL_TIMEOUT,
+    )
+    read_engine = create_engine(
+        settings.DATABASE_URL,
+        pool_size=settings.DB_READ_POOL_SIZE,
+        max_overflow=settings.DB_READ_MAX_OVERFLOW,
+    )
+    install_sqlite_pragmas(engine)
+    install_sqlite_pragmas(read_engine, read_only=True)
+else:
+    engine = create_engine(settings.DATABASE_URL)
+    read_engine = engine
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 Base = declarative_base()
 
-def get_db():
+# Ruta asíncrona: convive con la síncrona y apunta a la misma base de datos.
+# Igual que arriba, el escritor tiene una sola conexión y las lecturas van a un
+# pool de solo lectura. Con SQLite hay como máximo dos escritores por proceso
+# (el síncrono y el asíncrono); busy_timeout cubre ese solapamiento. aiosqlite
+# usa NullPool por defecto (una conexión por sesión), de ahí el pool explícito.
+# expire_on_commit=False porque tras el commit no se puede hacer lazy load.
+if _is_sqlite and not _is_memory:
+    async_engine = create_async_engine(
+        get_async_database_url(),
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=settings.DB_WRITE_POOL_TIMEOUT,
+    )
+    async_read_engine = create_async_engine(
+        get_async_database_url(),
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.DB_READ_POOL_SIZE,
+        max_overflow=settings.DB_READ_MAX_OVERFLOW,
+    )
+    install_sqlite_pragmas(async_engine.sync_engine)
+    install_sqlite_pragmas(async_read_engine.sync_engine, read_only=True)
+else:
+    async_engine = create_async_engine(get_async_database_url())
+    async_read_engine = async_engine
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
+# ----------------------
+# Ciclo de vida de las engines por worker
+# ----------------------
+# Un proceso hijo creado con fork hereda los pools del padre: sus conexiones
+# SQLite no se pueden compartir, así que se abandonan sin cerrarlas (las
+# cierra el padre) y cada worker abre las suyas. open_pools las precalienta al
+# arrancar (PRAGMAs aplicados antes de la primera solicitud) y close_pools las
+# libera al apagar.
+
+def _sync_engines():
+    return {engine, read_engine, async_engine.sync_engine, async_read_engine.sync_engine}
+
+def _reset_pools_after_fork():
+    for sync_engine in _sync_engines():
+        sync_engine.dispose(close=False)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+async def open_pools():
+    for sync_engine in (engine, read_engine):
+        with sync_engine.connect():
+            pass
+    for async_pool in {async_engine, async_read_engine}:
+        async with async_pool.connect():
+            pass
+
+async def close_pools():
+    for async_pool in {async_engine, async_read_engine}:
+        await async_pool.dispose()
+    for sync_engine in (engine, read_engine):
+        sync_engine.dispose()
+
+def get_write_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_db(request: Request):
+    # Las peticiones de lectura van al pool de solo lectura; el resto al escritor
+    db = ReadSessionLocal() if request.method in READ_METHODS else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db(request: Request):
+    # Mismo criterio que get_db: lecturas al pool de solo lectura, el resto al escritor
+    session_factory = AsyncReadSessionLocal if request.method in READ_METHODS else AsyncSessionLocal
+    async with session_factory() as db:
+        yield db
+
+async def get_async_read_db():
+    # Consultas que nunca escriben (autenticación), aunque la petición sea una escritura
+    async with AsyncReadSessionLocal() as db:
+        yield db
@@ -0,0 +1,85 @@
+import sys
+
+from sqlalchemy import delete, exists, func, select
+
+from database import upsert_insert
+from models.evaluation import Evaluation
+from models.final_grade import FinalGrade
+from models.grade import Grade
+
+# ----------------------
+# Mantenimiento de notas definitivas
+# ----------------------
+# promedio ponderado = Σ(nota · porcentaje) / Σ(porcentaje) de las evaluaciones
+# con nota; percentage_covered = Σ(porcentaje) de esas evaluaciones.
+# Las funciones reciben una Session o Connection y no hacen commit: se llaman
+# dentro de la misma transacción que modifica las notas.
+
+
+def _aggregate(subject_id=None, student_ids=None):
+    total_percentage = func.sum(Evaluation.percentage)
+    stmt = (
+        select(
+            Grade.student_id,
+            Evaluation.subject_id,
+            func.coalesce(func.sum(Grade.score * Evaluation.percentage) / func.nullif(total_percentage, 0), 0),
+            total_percentage,
+            func.now(),
+        )
+        .join(Evaluation, Evaluation.id == Grade.evaluation_id)
+        # SQLite necesita un WHERE en INSERT ... SELECT ... ON CONFLICT
+        .where(True if subject_id is None else Evaluation.subject_id == subject_id)
+        .group_by(Grade.student_id, Evaluation.subject_id)
+    )
+    if student_ids is not None:
+        stmt = stmt.where(Grade.student_id.in_(student_ids))
+    return stmt
+
+
+def _upsert(db, source):
+    stmt = upsert_insert(db, FinalGrade).from_select(
+        ["student_id", "subject_id", "weighted_average", "percentage_covered", "updated_at"], source
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[FinalGrade.student_id, FinalGrade.subject_id],
+        set_={
+            "weighted_average": stmt.excluded.weighted_average,
+            "percentage_covered": stmt.excluded.percentage_covered,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    db.execute(stmt)
+
+
+def refresh_final_grades(db, subject_id: int, student_ids=None):
+    # Recalcula la materia completa o solo los estudiantes indicados
+    student_ids = None if student_ids is None else list(student_ids)
+    _upsert(db, _aggregate(subject_id, student_ids))
+
+    # Quien ya no tiene notas en la materia deja de tener nota definitiva
+    graded = exists().where(
+        Grade.student_id == FinalGrade.student_id,
+        Grade.evaluation_id == Evaluation.id,
+        Evaluation.subject_id == FinalGrade.subject_id,
+    )
+    stale = delete(FinalGrade).where(FinalGrade.subject_id == subject_id, ~graded)
+    if student_ids is not None:
+        stale = stale.where(FinalGrade.student_id.in_(student_ids))
+    db.execute(stale)
+
+
+def rebuild_final_grades(db):
+    db.execute(delete(FinalGrade))
+    _upsert(db, _aggregate())
+
+
+if __name__ == "__main__":
+    # Reconstrucción completa para reparaciones: python grading.py rebuild
+    from database import engine
+
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("Uso: python grading.py rebuild")
+    with engine.begin() as conn:
+        rebuild_final_grades(conn)
+        total = conn.execute(select(func.count()).select_from(FinalGrade)).scalar()
+    print(f"✔ Notas definitivas reconstruidas: {total}")
@@ -1,40 +1,79 @@
-from fastapi import FastAPI, Request
-from database import engine, Base
+import time
+
+_import_started = time.perf_counter()
+
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from access_log import AccessLogMiddleware, log_event, writer as access_log_writer
+from config import settings
+from database import close_pools, engine, open_pools
+from metrics import MetricsMiddleware, format_labels, registry
+from query_stats import QueryStatsMiddleware
 from models import __all__
 from routes import routers
+from security import shutdown_pools
+import migrations
+
+# Tiempos de arranque del worker, en segundos: import (importar la app),
+# factory (armar FastAPI) y ready (desde el import hasta terminar el lifespan)
+startup_timings = {"import": time.perf_counter() - _import_started}
+
+def _collect_startup():
+    lines = ["# HELP process_startup_seconds Tiempo de arranque del worker por fase.", "# TYPE process_startup_seconds gauge"]
+    for phase, seconds in startup_timings.items():
+        lines.append(f"process_startup_seconds{format_labels(phase=phase)} {seconds}")
+    return lines
+
+registry.collectors.append(_collect_startup)
+
+def apply_migrations():
+    # El esquema se gestiona con `python -m migrations`; aquí solo se aplican pendientes
+    for name in migrations.upgrade(engine):
+        print(f"🛠️ Migración aplicada: {name}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.AUTO_MIGRATE:
+        apply_migrations()
+    await open_pools()
+    startup_timings["ready"] = time.perf_counter() - _import_started
+    log_event("info", "startup", pid=os.getpid(), **{f"{phase}_ms": round(seconds * 1000, 1) for phase, seconds in startup_timings.items()})
+    yield
+    await close_pools()
+    shutdown_pools()
+    access_log_writer.close()
 
-Base.metadata.create_all(bind=engine)
+def create_app() -> FastAPI:
+    started = time.perf_counter()
+    app = FastAPI(lifespan=lifespan)
 
-app = FastAPI()
+    app.add_middleware(AccessLogMiddleware)
+    app.add_middleware(QueryStatsMiddleware)
+    app.add_middleware(MetricsMiddleware)
 
-@app.middleware("http")
-async def log_url_middleware(request: Request, call_next):
-    print(f"➡️ {request.method} {request.url.path}")
-    response = await call_next(request)
-    print(f"⬅️ {response.status_code} {request.url.path}")
-    return response
+    # Incluir todas las rutas
+    for r in routers:
+        app.include_router(r)
 
+    @app.get("/")
+    def root():
+        return {"message": "Hola Escuela 🚀"}
 
-# Incluir todas las rutas
-for r in routers:
-    app.include_router(r)
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        # Formato de exposición de Prometheus; async para leer en el mismo hilo que escribe el middleware
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
-@app.get("/")
-def root():
-    return {"message": "Hola Escuela 🚀"}
+    startup_timings["factory"] = time.perf_counter() - started
+    return app
 
-def get_local_ip():
-    import socket
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    try:
-        s.connect(("8.8.8.8", 80))
-        ip = s.getsockname()[0]
-    finally:
-        s.close()
-    return ip
+# `uvicorn main:app` sigue funcionando; create_app queda para tests y benchmarks que quieren una app nueva
+app = create_app()
 
 if __name__ == "__main__":
+    # Un solo proceso para desarrollo; en producción usar `python server.py`
     import uvicorn
-    local_ip = get_local_ip()
-    print(f"🚀 Backend corriendo en: http://{local_ip}:8000")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    print(f"🚀 Backend corriendo en: http://{settings.HOST}:{settings.PORT}")
+    uvicorn.run(app, host=settings.HOST, port=settings.PORT)
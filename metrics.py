@@ -0,0 +1,171 @@
+import time
+from bisect import bisect_left
+
+# ----------------------
+# Métricas en proceso (formato de texto de Prometheus)
+# ----------------------
+# Middleware ASGI puro: no envuelve la respuesta en otra capa de Starlette,
+# solo intercepta `send` para leer el status y contar bytes (sirve también
+# para StreamingResponse). Se agrupa por plantilla de ruta
+# ("/grades/{grade_id}"), no por URL, para acotar la cardinalidad.
+# Las actualizaciones ocurren en el hilo del event loop, así que no hay locks.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUANTILES = (0.5, 0.95, 0.99)
+UNMATCHED_ROUTE = "<sin ruta>"
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # el último es +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        # Interpolación lineal dentro del bucket, como histogram_quantile()
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.bounds[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+
+class RouteStats:
+    __slots__ = ("latency", "size", "statuses", "errors")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.statuses = {}
+        self.errors = 0
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(**labels):
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def histogram_lines(name, labels, histogram):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.bounds + ("+Inf",), histogram.counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{format_labels(**labels, le=bound)} {cumulative}")
+    lines.append(f"{name}_sum{format_labels(**labels)} {histogram.sum}")
+    lines.append(f"{name}_count{format_labels(**labels)} {histogram.count}")
+    return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.started = time.time()
+        self.in_flight = 0
+        self.routes = {}
+        self.collectors = []  # funciones extra que devuelven líneas de texto
+
+    def record(self, method, route, status, elapsed, size):
+        stats = self.routes.get((method, route))
+        if stats is None:
+            stats = self.routes[(method, route)] = RouteStats()
+        stats.latency.observe(elapsed)
+        stats.size.observe(size)
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        if status >= 500:
+            stats.errors += 1
+
+    def render(self):
+        lines = [
+            "# HELP process_start_time_seconds Inicio del proceso (epoch).",
+            "# TYPE process_start_time_seconds gauge",
+            f"process_start_time_seconds {self.started}",
+            "# HELP http_requests_in_flight Solicitudes en curso.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+        ]
+        routes = sorted(self.routes.items())
+
+        lines += ["# HELP http_requests_total Solicitudes atendidas.", "# TYPE http_requests_total counter"]
+        for (method, route), stats in routes:
+            for status, count in sorted(stats.statuses.items()):
+                lines.append(f"http_requests_total{format_labels(method=method, route=route, status=status)} {count}")
+
+        lines += ["# HELP http_request_errors_total Respuestas 5xx.", "# TYPE http_request_errors_total counter"]
+        for (method, route), stats in routes:
+            lines.append(f"http_request_errors_total{format_labels(method=method, route=route)} {stats.errors}")
+
+        lines += ["# HELP http_request_duration_seconds Latencia por ruta.", "# TYPE http_request_duration_seconds histogram"]
+        for (method, route), stats in routes:
+            lines += histogram_lines("http_request_duration_seconds", {"method": method, "route": route}, stats.latency)
+
+        lines += [
+            "# HELP http_request_duration_quantile_seconds p50/p95/p99 estimados desde el histograma.",
+            "# TYPE http_request_duration_quantile_seconds gauge",
+        ]
+        for (method, route), stats in routes:
+            for q in QUANTILES:
+                value = stats.latency.quantile(q)
+                lines.append(f"http_request_duration_quantile_seconds{format_labels(method=method, route=route, quantile=q)} {value}")
+
+        lines += ["# HELP http_response_size_bytes Tamaño del cuerpo de respuesta.", "# TYPE http_response_size_bytes histogram"]
+        for (method, route), stats in routes:
+            lines += histogram_lines("http_response_size_bytes", {"method": method, "route": route}, stats.size)
+
+        for collector in self.collectors:
+            lines += collector()
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    def __init__(self, app, registry: MetricsRegistry = registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        self.registry.in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            status = 500
+            raise
+        finally:
+            self.registry.in_flight -= 1
+            # FastAPI deja la ruta resuelta en el scope compartido
+            route = scope.get("route")
+            template = getattr(route, "path", UNMATCHED_ROUTE)
+            self.registry.record(scope["method"], template, status, time.perf_counter() - start, size)
@@ -0,0 +1,63 @@
+import importlib
+import pkgutil
+import re
+
+from sqlalchemy import text
+
+# ----------------------
+# Migraciones versionadas del esquema
+# ----------------------
+# Cada migración es un módulo `vNNN_nombre.py` en este paquete con una función
+# `upgrade(conn)`. Las versiones aplicadas se registran en `schema_migrations`;
+# al final de cada ejecución con cambios se corre ANALYZE para refrescar las
+# estadísticas del planificador. Uso: `python -m migrations [upgrade|status]`.
+
+VERSION_TABLE = "schema_migrations"
+_MODULE_NAME = re.compile(r"^v(\d+)_\w+$")
+
+
+def discover():
+    found = []
+    for info in pkgutil.iter_modules(__path__):
+        match = _MODULE_NAME.match(info.name)
+        if match:
+            found.append((int(match.group(1)), info.name))
+    return sorted(found)
+
+
+def _ensure_version_table(conn):
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} ("
+        "version INTEGER PRIMARY KEY, "
+        "name VARCHAR(100) NOT NULL, "
+        "applied_at DATETIME DEFAULT (CURRENT_TIMESTAMP))"
+    ))
+
+
+def applied_versions(engine):
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return {row[0] for row in conn.execute(text(f"SELECT version FROM {VERSION_TABLE}"))}
+
+
+def pending(engine):
+    applied = applied_versions(engine)
+    return [(version, name) for version, name in discover() if version not in applied]
+
+
+def upgrade(engine):
+    applied = []
+    for version, name in pending(engine):
+        module = importlib.import_module(f"{__name__}.{name}")
+        with engine.begin() as conn:
+            module.upgrade(conn)
+            conn.execute(
+                text(f"INSERT INTO {VERSION_TABLE} (version, name) VALUES (:version, :name)"),
+                {"version": version, "name": name},
+            )
+        applied.append(name)
+
+    if applied:
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+    return applied
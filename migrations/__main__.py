@@ -0,0 +1,16 @@
+import sys
+
+from database import engine
+from migrations import applied_versions, discover, upgrade
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    if command == "upgrade":
+        applied = upgrade(engine)
+        print("\n".join(f"✔ {name}" for name in applied) or "El esquema ya está actualizado")
+    elif command == "status":
+        done = applied_versions(engine)
+        for version, name in discover():
+            print(f"{'✔' if version in done else '·'} {name}")
+    else:
+        sys.exit(f"Comando desconocido: {command} (usa 'upgrade' o 'status')")
@@ -0,0 +1,10 @@
+from database import Base
+import models  # noqa: F401  registra las tablas en Base.metadata
+
+# Esquema inicial: users, subjects, enrollments, evaluations, grades.
+# En bases existentes (creadas antes con create_all) no hace nada.
+TABLES = ["users", "subjects", "enrollments", "evaluations", "grades"]
+
+
+def upgrade(conn):
+    Base.metadata.create_all(conn, tables=[Base.metadata.tables[name] for name in TABLES])
@@ -0,0 +1,59 @@
+from sqlalchemy import text
+
+# Índices de las columnas usadas en permisos y filtros, más la unicidad de
+# matrícula (estudiante, materia) y nota (estudiante, evaluación). Los índices
+# únicos empiezan por student_id, así que también cubren las búsquedas por
+# estudiante en grades y enrollments.
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_users_role ON users (role)",
+    "CREATE INDEX IF NOT EXISTS ix_subjects_teacher_id ON subjects (teacher_id)",
+    "CREATE INDEX IF NOT EXISTS ix_enrollments_subject_id ON enrollments (subject_id)",
+    "CREATE INDEX IF NOT EXISTS ix_evaluations_subject_id ON evaluations (subject_id)",
+    "CREATE INDEX IF NOT EXISTS ix_grades_evaluation_id ON grades (evaluation_id)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_enrollments_student_subject ON enrollments (student_id, subject_id)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_grades_student_evaluation ON grades (student_id, evaluation_id)",
+]
+
+# Antes de crear los índices únicos los duplicados NO se borran: se mueven a
+# <tabla>_quarantine (con la fecha del movimiento) para revisarlos a mano. De
+# cada par se queda en la tabla la fila con el updated_at más reciente (a
+# igualdad, la de mayor id); las demás se mueven y se informa cuántas.
+DUPLICATE_KEYS = {
+    "enrollments": ("student_id", "subject_id"),
+    "grades": ("student_id", "evaluation_id"),
+}
+
+
+def _duplicate_ids(table, keys):
+    return (
+        f"SELECT id FROM (SELECT id, ROW_NUMBER() OVER ("
+        f"PARTITION BY {', '.join(keys)} ORDER BY updated_at DESC, id DESC) AS position FROM {table}) "
+        "WHERE position > 1"
+    )
+
+
+def quarantine_duplicates(conn, table, keys):
+    duplicates = [row[0] for row in conn.execute(text(_duplicate_ids(table, keys)))]
+    if not duplicates:
+        return 0
+    quarantine = f"{table}_quarantine"
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {quarantine} AS "
+        f"SELECT *, CURRENT_TIMESTAMP AS quarantined_at FROM {table} WHERE 0"
+    ))
+    conn.execute(text(
+        f"INSERT INTO {quarantine} SELECT *, CURRENT_TIMESTAMP FROM {table} WHERE id IN ({_duplicate_ids(table, keys)})"
+    ))
+    conn.execute(text(f"DELETE FROM {table} WHERE id IN (SELECT id FROM {quarantine})"))
+    print(
+        f"⚠️ {len(duplicates)} filas duplicadas de {table} por ({', '.join(keys)}) movidas a {quarantine}: "
+        f"ids {', '.join(map(str, duplicates))}"
+    )
+    return len(duplicates)
+
+
+def upgrade(conn):
+    for table, keys in DUPLICATE_KEYS.items():
+        quarantine_duplicates(conn, table, keys)
+    for statement in INDEXES:
+        conn.execute(text(statement))
@@ -0,0 +1,8 @@
+from database import Base
+from grading import rebuild_final_grades
+import models  # noqa: F401  registra las tablas en Base.metadata
+
+
+def upgrade(conn):
+    Base.metadata.tables["final_grades"].create(conn, checkfirst=True)
+    rebuild_final_grades(conn)
@@ -0,0 +1,40 @@
+from sqlalchemy import text
+
+# Índices de texto completo (FTS5) sobre usuarios y materias. Son tablas de
+# contenido externo: guardan solo el índice y leen el texto de la tabla
+# original por rowid; los triggers las mantienen al día en cada INSERT,
+# UPDATE y DELETE (incluidas las cargas masivas con ON CONFLICT). Con
+# remove_diacritics "garcia" encuentra "García". Solo aplica a SQLite; en
+# otros motores la búsqueda usa LIKE (ver routes/search.py).
+INDEXES = {
+    "users": ("name", "email", "idnumber"),
+    "subjects": ("name", "description"),
+}
+TOKENIZER = "unicode61 remove_diacritics 2"
+
+
+def _statements(table, columns):
+    fts = f"{table}_fts"
+    names = ", ".join(columns)
+    new = ", ".join(f"new.{column}" for column in columns)
+    old = ", ".join(f"old.{column}" for column in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{names}, content='{table}', content_rowid='id', tokenize='{TOKENIZER}')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts} (rowid, {names}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts} ({fts}, rowid, {names}) VALUES ('delete', old.id, {old}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {names} ON {table} BEGIN "
+        f"INSERT INTO {fts} ({fts}, rowid, {names}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {fts} (rowid, {names}) VALUES (new.id, {new}); END",
+        f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')",
+    ]
+
+
+def upgrade(conn):
+    if conn.dialect.name != "sqlite":
+        return
+    for table, columns in INDEXES.items():
+        for statement in _statements(table, columns):
+            conn.execute(text(statement))
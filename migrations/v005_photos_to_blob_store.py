@@ -0,0 +1,34 @@
+from sqlalchemy import text
+
+from blobs import InvalidPhoto, decode_inline_photo, photo_store
+
+# Saca de la tabla users las fotos guardadas en línea (base64 o data URI): se
+# escriben en el almacén de blobs, con sus miniaturas, y la columna queda con
+# el hash. Las URLs externas se conservan; el texto demasiado largo que no es
+# una imagen válida se descarta para no volver a inflar las respuestas.
+BATCH_SIZE = 200
+MAX_KEPT_LENGTH = 2048
+
+
+def upgrade(conn):
+    last_id = -1
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, photo FROM users WHERE id > :last_id AND length(photo) > 64 ORDER BY id LIMIT :limit"
+        ), {"last_id": last_id, "limit": BATCH_SIZE}).all()
+        if not rows:
+            return
+        updates = []
+        for user_id, photo in rows:
+            data = decode_inline_photo(photo)
+            digest = None
+            if data is not None:
+                try:
+                    digest = photo_store.put_photo(data)
+                except InvalidPhoto:
+                    pass
+            if digest is not None or len(photo) > MAX_KEPT_LENGTH:
+                updates.append({"id": user_id, "photo": digest})
+        if updates:
+            conn.execute(text("UPDATE users SET photo = :photo, updated_at = CURRENT_TIMESTAMP WHERE id = :id"), updates)
+        last_id = rows[-1][0]
@@ -3,6 +3,7 @@ from .subject import Subject
 from .enrollment import Enrollment
 from .evaluation import Evaluation
 from .grade import Grade
+from .final_grade import FinalGrade
 
 __all__ = [
     User,
@@ -11,4 +12,5 @@ __all__ = [
     Enrollment,
     Evaluation,
     Grade,
+    FinalGrade,
 ]
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, func
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, func
 from database import Base
 from sqlalchemy.orm import relationship
 
@@ -9,10 +9,14 @@ from sqlalchemy.orm import relationship
 
 class Enrollment(Base):
     __tablename__ = "enrollments"
+    __table_args__ = (
+        # Una matrícula por estudiante y materia (también indexa student_id)
+        Index("uq_enrollments_student_subject", "student_id", "subject_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    subject_id = Column(Integer, ForeignKey("subjects.id"), nullable=False)
+    subject_id = Column(Integer, ForeignKey("subjects.id"), nullable=False, index=True)
 
     active = Column(Boolean, default=True)
     enrolled_at = Column(DateTime, server_default=func.now())
@@ -12,7 +12,7 @@ class Evaluation(Base):
     name = Column(String(100), nullable=False)
     description = Column(String(255), nullable=True)
     percentage = Column(Integer, nullable=False, default=0)  # porcentaje de la evaluación en la materia
-    subject_id = Column(Integer, ForeignKey("subjects.id"), nullable=False)
+    subject_id = Column(Integer, ForeignKey("subjects.id"), nullable=False, index=True)
     
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
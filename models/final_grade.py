@@ -0,0 +1,21 @@
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, func
+from database import Base
+
+# ----------------------
+# Notas definitivas (materializadas)
+# ----------------------
+# Promedio ponderado por estudiante y materia. Se mantiene desde grading.py
+# cada vez que cambia una nota o el porcentaje de una evaluación.
+class FinalGrade(Base):
+    __tablename__ = "final_grades"
+    __table_args__ = (
+        Index("uq_final_grades_student_subject", "student_id", "subject_id", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    subject_id = Column(Integer, ForeignKey("subjects.id"), nullable=False, index=True)
+    weighted_average = Column(Float, nullable=False)  # 0.0 - 5.0 sobre lo evaluado
+    percentage_covered = Column(Float, nullable=False)  # suma de porcentajes con nota
+
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
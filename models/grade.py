@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, func
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, func
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -7,10 +7,14 @@ from database import Base
 # ----------------------
 class Grade(Base):
     __tablename__ = "grades"
+    __table_args__ = (
+        # Una nota por estudiante y evaluación (también indexa student_id)
+        Index("uq_grades_student_evaluation", "student_id", "evaluation_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    evaluation_id = Column(Integer, ForeignKey("evaluations.id"), nullable=False)
+    evaluation_id = Column(Integer, ForeignKey("evaluations.id"), nullable=False, index=True)
     score = Column(Float, nullable=False)  # 0.0 - 5.0
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
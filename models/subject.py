@@ -12,7 +12,7 @@ class Subject(Base):
     name = Column(String(100), nullable=False)
     description = Column(String(250))
 
-    teacher_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    teacher_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
 
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
@@ -22,9 +22,9 @@ class User(Base):
     email = Column(String(120), unique=True, nullable=False)
     idnumber = Column(String(15), unique=True, nullable=False)
     password = Column(String(255), nullable=False)
-    role = Column(Enum(UserRole), nullable=False)
+    role = Column(Enum(UserRole), nullable=False, index=True)
     age = Column(Integer, nullable=True)
-    photo = Column(Text, nullable=True)  # URL o path a la foto
+    photo = Column(Text, nullable=True)  # hash en el almacén de fotos (blobs.py) o URL externa
     active = Column(Boolean, default=True)
     
     created_at = Column(DateTime, server_default=func.now())
@@ -0,0 +1,160 @@
+import heapq
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import settings
+from metrics import UNMATCHED_ROUTE, Histogram, format_labels, histogram_lines, registry
+
+# ----------------------
+# Instrumentación de SQL por solicitud
+# ----------------------
+# Los eventos de cursor de SQLAlchemy (todas las engines, incluida la async)
+# acumulan en el objeto de la solicitud actual, guardado en un ContextVar:
+# Starlette copia el contexto a los hilos donde corren los endpoints sync,
+# así que sus consultas también se cuentan. Fuera de una solicitud no se
+# registra nada.
+# Una misma sentencia parametrizada repetida más de SQL_N_PLUS_ONE_THRESHOLD
+# veces se marca como probable N+1. Con SQL_DEBUG_HEADERS el resumen viaja en
+# headers X-DB-*; siempre se agrega a /metrics por ruta.
+
+STATEMENT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+DB_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+HEADER_STATEMENT_LENGTH = 120
+
+_current = ContextVar("query_stats", default=None)
+
+
+class QueryStats:
+    __slots__ = ("count", "total", "statements", "slowest")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.statements = {}  # sentencia -> repeticiones
+        self.slowest = []  # heap (duración, sentencia) de las más lentas
+
+    def add(self, statement, elapsed):
+        self.count += 1
+        self.total += elapsed
+        self.statements[statement] = self.statements.get(statement, 0) + 1
+        if len(self.slowest) < settings.SQL_SLOWEST_KEPT:
+            heapq.heappush(self.slowest, (elapsed, statement))
+        elif elapsed > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (elapsed, statement))
+
+    def repeated(self):
+        # Sentencias sospechosas de N+1: (repeticiones, sentencia), de más a menos
+        threshold = settings.SQL_N_PLUS_ONE_THRESHOLD
+        return sorted(
+            ((count, statement) for statement, count in self.statements.items() if count > threshold), reverse=True
+        )
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        context._query_stats_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    start = getattr(context, "_query_stats_start", None)
+    if stats is not None and start is not None:
+        stats.add(statement, time.perf_counter() - start)
+
+
+def current_query_stats():
+    # Resumen de la solicitud en curso (None fuera de QueryStatsMiddleware)
+    return _current.get()
+
+
+# --- Agregado por ruta para /metrics --- #
+
+class _RouteQueries:
+    __slots__ = ("statements", "db_time", "n_plus_one")
+
+    def __init__(self):
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.db_time = Histogram(DB_TIME_BUCKETS)
+        self.n_plus_one = 0
+
+
+_routes = {}
+_slowest = []  # heap global (duración, sentencia, ruta) de las más lentas del proceso
+
+
+def _record(method, route, stats: QueryStats):
+    entry = _routes.get((method, route))
+    if entry is None:
+        entry = _routes[(method, route)] = _RouteQueries()
+    entry.statements.observe(stats.count)
+    entry.db_time.observe(stats.total)
+    if stats.repeated():
+        entry.n_plus_one += 1
+    for elapsed, statement in stats.slowest:
+        item = (elapsed, statement, route)
+        if len(_slowest) < settings.SQL_SLOWEST_KEPT:
+            heapq.heappush(_slowest, item)
+        elif elapsed > _slowest[0][0]:
+            heapq.heapreplace(_slowest, item)
+
+
+def _collect():
+    routes = sorted(_routes.items())
+    lines = ["# HELP db_statements_per_request Sentencias SQL por solicitud.", "# TYPE db_statements_per_request histogram"]
+    for (method, route), entry in routes:
+        lines += histogram_lines("db_statements_per_request", {"method": method, "route": route}, entry.statements)
+    lines += ["# HELP db_time_per_request_seconds Tiempo en la base por solicitud.", "# TYPE db_time_per_request_seconds histogram"]
+    for (method, route), entry in routes:
+        lines += histogram_lines("db_time_per_request_seconds", {"method": method, "route": route}, entry.db_time)
+    lines += ["# HELP db_n_plus_one_total Solicitudes con una sentencia repetida (probable N+1).", "# TYPE db_n_plus_one_total counter"]
+    for (method, route), entry in routes:
+        lines.append(f"db_n_plus_one_total{format_labels(method=method, route=route)} {entry.n_plus_one}")
+    lines += ["# HELP db_slowest_statement_seconds Sentencias más lentas vistas por el proceso.", "# TYPE db_slowest_statement_seconds gauge"]
+    for elapsed, statement, route in sorted(_slowest, reverse=True):
+        statement = " ".join(statement.split())[:HEADER_STATEMENT_LENGTH]
+        lines.append(f"db_slowest_statement_seconds{format_labels(route=route, statement=statement)} {elapsed}")
+    return lines
+
+
+registry.collectors.append(_collect)
+
+
+def _header_value(statement):
+    # Los headers no admiten saltos de línea; se compacta y recorta
+    return " ".join(statement.split())[:HEADER_STATEMENT_LENGTH].encode("latin-1", "replace")
+
+
+class QueryStatsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = QueryStats()
+        token = _current.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and settings.SQL_DEBUG_HEADERS:
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-queries", str(stats.count).encode()))
+                headers.append((b"x-db-time-ms", f"{stats.total * 1000:.2f}".encode()))
+                for elapsed, statement in sorted(stats.slowest, reverse=True)[:3]:
+                    headers.append((b"x-db-slowest", b"%.2fms " % (elapsed * 1000) + _header_value(statement)))
+                for count, statement in stats.repeated()[:3]:
+                    headers.append((b"x-db-n-plus-one", b"%dx " % count + _header_value(statement)))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            _record(scope["method"], route, stats)
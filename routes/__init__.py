@@ -3,6 +3,10 @@ from .subjects import router as subjects_router
 from .grades import router as grades_router
 from .evaluations import router as evaluations_router
 from .enrollments import router as enrollments_router
+from .final_grades import router as final_grades_router
+from .exports import router as exports_router
+from .search import router as search_router
+from .photos import router as photos_router
 
 routers = [
     users_router,
@@ -10,4 +14,8 @@ routers = [
     grades_router,
     evaluations_router,
     enrollments_router,
+    final_grades_router,
+    exports_router,
+    search_router,
+    photos_router,
 ]
@@ -0,0 +1,112 @@
+from itertools import chain
+
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy import event, inspect, literal, select
+from sqlalchemy.orm import Session
+from cache import TTLCache
+from config import settings
+from database import READ_METHODS, get_db
+from models.enrollment import Enrollment
+from models.subject import Subject
+from models.user import User, UserRole
+
+from .users import get_current_user  # autenticación
+
+# ----------------------
+# Alcance de autorización por usuario
+# ----------------------
+# Las materias que el usuario dicta y en las que está matriculado (activo) se
+# cargan con una sola consulta y se guardan por usuario; cada verificación de
+# permisos es una búsqueda en un conjunto y los listados filtran con
+# `restrict`. El administrador no necesita consulta. La caché se invalida al
+# hacer commit cuando la sesión toca matrículas o el profesor de una materia;
+# las escrituras con Core llaman a `mark_scopes_changed`. La invalidación es
+# local al worker, así que la caché solo responde lecturas (desfase máximo
+# ACCESS_SCOPE_CACHE_TTL_SECONDS); las escrituras cargan el alcance de la base.
+
+scope_cache = TTLCache(settings.ACCESS_SCOPE_CACHE_SIZE, settings.ACCESS_SCOPE_CACHE_TTL_SECONDS)
+USERS_KEY = "access_scope_users"
+
+
+class AccessScope:
+    __slots__ = ("user_id", "role", "taught", "enrolled")
+
+    def __init__(self, user_id: int, role: UserRole, taught=frozenset(), enrolled=frozenset()):
+        self.user_id = user_id
+        self.role = role
+        self.taught = taught
+        self.enrolled = enrolled
+
+    @property
+    def is_admin(self):
+        return self.role == UserRole.ADMIN
+
+    @property
+    def subject_ids(self):
+        return self.taught | self.enrolled
+
+    def can_manage(self, subject_id: int):
+        # Administrador o profesor de la materia
+        return self.is_admin or subject_id in self.taught
+
+    def can_view(self, subject_id: int):
+        return self.is_admin or subject_id in self.taught or subject_id in self.enrolled
+
+    def require(self, db: Session, subject_id: int, detail: str, manage: bool = False, not_found: str = "Materia no encontrada"):
+        # Sin consultas para profesores y estudiantes; al administrador se le confirma que la materia existe
+        if self.is_admin:
+            if db.get(Subject, subject_id) is None:
+                raise HTTPException(status_code=404, detail=not_found)
+        elif not (self.can_manage(subject_id) if manage else self.can_view(subject_id)):
+            raise HTTPException(status_code=403, detail=detail)
+
+    def restrict(self, column):
+        # Criterios para limitar un listado a las materias del usuario
+        return [] if self.is_admin else [column.in_(sorted(self.subject_ids))]
+
+
+def load_scope(db: Session, user: User, fresh: bool = False):
+    if user.role == UserRole.ADMIN:
+        return AccessScope(user.id, user.role)
+    scope = None if fresh else scope_cache.get(user.id)
+    if scope is None:
+        taught, enrolled = set(), set()
+        stmt = select(literal("t"), Subject.id).where(Subject.teacher_id == user.id).union_all(
+            select(literal("e"), Enrollment.subject_id).where(Enrollment.student_id == user.id, Enrollment.active == True)
+        )
+        for kind, subject_id in db.execute(stmt):
+            (taught if kind == "t" else enrolled).add(subject_id)
+        scope = AccessScope(user.id, user.role, frozenset(taught), frozenset(enrolled))
+        scope_cache.set(user.id, scope)
+    return scope
+
+
+def get_access_scope(request: Request, db: Session = Depends(get_db), curr_user: User = Depends(get_current_user)):
+    # FastAPI resuelve la dependencia una vez por solicitud aunque varios parámetros la pidan
+    return load_scope(db, curr_user, fresh=request.method not in READ_METHODS)
+
+
+def mark_scopes_changed(db, user_ids):
+    db.info.setdefault(USERS_KEY, set()).update(user_ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_users(session, flush_context):
+    users = session.info.setdefault(USERS_KEY, set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Enrollment):
+            users.add(obj.student_id)
+        elif isinstance(obj, Subject):
+            history = inspect(obj).attrs.teacher_id.history
+            users.update(chain(history.added or (), history.deleted or (), history.unchanged or ()))
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_users(session):
+    for user_id in session.info.pop(USERS_KEY, ()):
+        scope_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_users(session):
+    session.info.pop(USERS_KEY, None)
@@ -0,0 +1,61 @@
+import codecs
+import csv
+import io
+
+from fastapi import HTTPException, Request
+from config import settings
+
+# ----------------------
+# Utilidades para cargas masivas
+# ----------------------
+
+BULK_BATCH_SIZE = 500
+
+
+def batches(items, size=BULK_BATCH_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# Lectura de CSV
+# Decodifica el cuerpo a medida que llega (hasta BULK_CSV_MAX_BYTES) y devuelve
+# [(fila, {columna: valor})]. Las columnas se normalizan a minúsculas; la fila 1
+# es la primera tras el encabezado. El texto completo pasa por un único
+# csv.reader, así los campos entre comillas pueden contener saltos de línea.
+
+CSV_REQUEST_BODY = {"requestBody": {"content": {"text/csv": {"schema": {"type": "string"}}}, "required": True}}
+
+
+async def read_csv_records(request: Request, required_any: tuple[str, ...] = ()):
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    text, size = io.StringIO(), 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > settings.BULK_CSV_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"El CSV supera el máximo de {settings.BULK_CSV_MAX_BYTES} bytes")
+        text.write(decoder.decode(chunk))
+    text.write(decoder.decode(b"", final=True))
+    text.seek(0)
+
+    reader = csv.reader(text)
+    records, columns = [], None
+    try:
+        for values in reader:
+            if len(values) <= 1 and not "".join(values).strip():
+                continue
+            values = [value.strip() for value in values]
+            if columns is None:
+                columns = [value.lower() for value in values]
+                if required_any and not any(column in columns for column in required_any):
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"El CSV debe tener alguna de las columnas: {', '.join(required_any)}",
+                    )
+                continue
+            if len(records) >= settings.BULK_CSV_MAX_ROWS:
+                raise HTTPException(status_code=413, detail=f"El CSV supera el máximo de {settings.BULK_CSV_MAX_ROWS} filas")
+            records.append((len(records) + 1, dict(zip(columns, values))))
+    except csv.Error as e:
+        raise HTTPException(status_code=400, detail=f"CSV inválido en la línea {reader.line_num}: {e}")
+    return records
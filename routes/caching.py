@@ -0,0 +1,106 @@
+import hashlib
+import json
+from itertools import chain
+
+from fastapi import Request, Response
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from cache import make_response_cache
+from config import settings
+from models.enrollment import Enrollment
+from models.evaluation import Evaluation
+from models.grade import Grade
+from models.subject import Subject
+from models.user import User
+
+from .serialization import dumps, json_response, serializer
+
+# ----------------------
+# Caché de respuestas de lectura
+# ----------------------
+# Guarda el JSON ya serializado, con clave = ruta + parámetros + alcance del
+# usuario + generación de cada etiqueta de la que depende la respuesta.
+# Las etiquetas se invalidan solas al hacer commit: un listener de flush
+# anota qué materias/usuarios tocó la sesión. Las escrituras masivas con
+# Core (insert ... on conflict) no pasan por el flush y llaman a `mark_changed`.
+
+response_cache = make_response_cache(
+    settings.RESPONSE_CACHE_URL, settings.RESPONSE_CACHE_MAX_BYTES, settings.RESPONSE_CACHE_TTL_SECONDS
+)
+
+USER_ROWS = "users"  # datos de usuario embebidos en otros DTOs (profesor, estudiante)
+USER_LISTS = "user-lists"  # listados de UserDto, que incluyen materias, matrículas y notas
+TAGS_KEY = "response_cache_tags"
+
+
+def subject_tag(subject_id: int):
+    return f"subject:{subject_id}"
+
+
+def mark_changed(db, *tags):
+    # Sirve con Session y AsyncSession; se aplica en el próximo commit
+    db.info.setdefault(TAGS_KEY, set()).update(tags)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_tags(session, flush_context):
+    tags = session.info.setdefault(TAGS_KEY, set())
+    evaluation_ids = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Subject):
+            tags.update((subject_tag(obj.id), USER_LISTS))
+        elif isinstance(obj, Evaluation):
+            tags.add(subject_tag(obj.subject_id))
+        elif isinstance(obj, Enrollment):
+            tags.update((subject_tag(obj.subject_id), USER_LISTS))
+        elif isinstance(obj, Grade):
+            evaluation_ids.add(obj.evaluation_id)
+            tags.add(USER_LISTS)
+        elif isinstance(obj, User):
+            tags.update((USER_ROWS, USER_LISTS))
+    if evaluation_ids:
+        tags.update(subject_tag(subject_id) for (subject_id,) in session.execute(
+            select(Evaluation.subject_id).where(Evaluation.id.in_(evaluation_ids))
+        ))
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_tags(session):
+    tags = session.info.pop(TAGS_KEY, None)
+    if tags:
+        response_cache.bump(sorted(tags))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_tags(session):
+    session.info.pop(TAGS_KEY, None)
+
+
+def _reply(response: Response, response_model, body: bytes, headers: dict, status: str):
+    reply = json_response(response_model, None, response, body=body)
+    reply.headers.update(headers)
+    reply.headers["X-Cache"] = status
+    return reply
+
+
+def cached_response(request: Request, response: Response, response_model, scope, tags, load, shape=None):
+    # Uso: return cached_response(request, response, list[GradeDto], curr_user.id, [subject_tag(1)], lambda: ...)
+    if not response_cache.enabled:
+        return json_response(response_model, load(), response, shape=shape)
+    tags = sorted(tags)
+    versions = response_cache.versions(tags)
+    raw = repr((request.url.path, sorted(request.query_params.multi_items()), scope, tags, versions))
+    key = hashlib.sha1(raw.encode()).hexdigest()
+
+    entry = response_cache.get(key)
+    if entry is not None:
+        header_line, _, body = entry.partition(b"\n")
+        return _reply(response, response_model, body, json.loads(header_line), "HIT")
+
+    before = set(response.headers.keys())
+    body = dumps(serializer(response_model, shape.key if shape is not None else None)(load()))
+    # Headers que agregó load() (p. ej. X-Next-Cursor) viajan con la entrada
+    headers = {name: value for name, value in response.headers.items() if name not in before}
+    response_cache.set(key, json.dumps(headers).encode() + b"\n" + body)
+    return _reply(response, response_model, body, headers, "MISS")
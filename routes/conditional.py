@@ -0,0 +1,56 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import func, literal, select, union_all
+
+# ----------------------
+# GET condicional (ETag / Last-Modified)
+# ----------------------
+# Antes de cargar filas se ejecuta una sola consulta de sondeo con
+# count / total(id) / max(updated_at) por cada tabla que aporta datos al
+# cuerpo (incluidas las relaciones anidadas del DTO). Con eso se arma un ETag
+# débil; si coincide con If-None-Match se responde 304 sin tocar las filas.
+# Altas y bajas cambian count/total(id); las ediciones cambian max(updated_at).
+#
+# updated_at tiene resolución de segundos (CURRENT_TIMESTAMP de SQLite): si el
+# último cambio cae dentro de la ventana, otro cambio en el mismo segundo no
+# movería el ETag, así que en ese caso no se emiten validadores.
+
+FRESHNESS_WINDOW = timedelta(seconds=1)
+
+
+def probe(model, *criteria):
+    # Uso: probe(Grade, Grade.evaluation_id.in_(ids))
+    return select(func.count(model.id), func.total(model.id), func.max(model.updated_at)).where(*criteria)
+
+
+def _matches(if_none_match, etag):
+    if if_none_match.strip() == "*":
+        return True
+    # Comparación débil: se ignora el prefijo W/
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def conditional_get(request: Request, response: Response, db, probes, scope=""):
+    tagged = [p.add_columns(literal(i).label("probe")) for i, p in enumerate(probes)]
+    rows = sorted(db.execute(union_all(*tagged)).all(), key=lambda row: row[-1])
+    last_modified = max((row[2] for row in rows if row[2] is not None), default=None)
+    if last_modified is not None and last_modified >= datetime.utcnow() - FRESHNESS_WINDOW:
+        return
+
+    # El cuerpo depende también de la URL (filtros, cursor) y de quién consulta
+    fingerprint = repr((request.url.path, request.url.query, scope, [tuple(row[:3]) for row in rows]))
+    etag = 'W/"%s"' % hashlib.sha1(fingerprint.encode()).hexdigest()
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+    response.headers.update(headers)
+
+    # Solo If-None-Match: una baja no mueve Last-Modified, así que
+    # If-Modified-Since por sí solo podría dar 304 con datos viejos.
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and _matches(if_none_match, etag):
+        raise HTTPException(status_code=304, headers=headers)
@@ -27,7 +27,7 @@ class UserBaseDto(BaseModel):
     email: EmailStr
     age: int
     role: UserRole
-    photo: str | None = None
+    photo: str | None = None  # hash de la foto (GET /photos/{hash}) o URL externa
     active: bool
     created_at: datetime
     updated_at: datetime
@@ -83,6 +83,21 @@ class UserDto(UserBaseDto):
     enrollments: list[EnrollmentBaseDto] = []
     grades: list[GradeBaseDto] = []
 
+class BulkRejectedRowDto(BaseModel):
+    # Fila de una carga masiva que no se pudo procesar
+    row: int
+    reference: str | None
+    detail: str
+
+class BulkCreatedUserDto(BaseModel):
+    row: int
+    id: int
+    email: str
+
+class BulkUserResultDto(BaseModel):
+    created: list[BulkCreatedUserDto] = []
+    rejected: list[BulkRejectedRowDto] = []
+
 class TokenDto(BaseModel):
     access_token: str
     token_type: str
@@ -111,12 +126,42 @@ class EvaluationDto(EvaluationBaseDto):
     subject: SubjectBaseDto
     grades: list[GradeBaseDto] = []
 
+class GradebookStudentDto(BaseModel):
+    id: int
+    name: str
+    idnumber: str
+    active: bool  # matrícula activa
+
+class GradebookEvaluationDto(BaseModel):
+    id: int
+    name: str
+    percentage: float
+
+class GradebookDto(BaseModel):
+    # Matriz densa: scores[i][j] es la nota del estudiante i en la evaluación j (None si no tiene)
+    subject_id: int
+    students: list[GradebookStudentDto]
+    evaluations: list[GradebookEvaluationDto]
+    scores: list[list[float | None]]
+    final_grades: list[float | None]
+
 class SubjectDto(SubjectBaseDto):
     # Relaciones
     teacher: UserBaseDto
     enrollments: list[EnrollmentBaseDto] = []
     evaluations: list[EvaluationDto] = []
     
+class PhotoDto(BaseModel):
+    # photo es el hash que guardan los usuarios; las URLs no cambian nunca
+    photo: str
+    url: str
+    thumbnails: dict[int, str]
+
+class SearchResultDto(BaseModel):
+    # Coincidencias ordenadas por relevancia
+    users: list[UserBaseDto] = []
+    subjects: list[SubjectBaseDto] = []
+
 class CreateGradeDto(BaseModel):
     student_id: int
     evaluation_id: int
@@ -126,6 +171,18 @@ class CreateGradeDto(BaseModel):
 class UpdateGradeDto(BaseModel):
     score: Optional[float] = Field(None, ge=0.0, le=5.0)
 
+class BulkGradeItemDto(BaseModel):
+    student_id: int
+    score: float = Field(..., ge=0.0, le=5.0)
+
+class BulkGradeResultDto(BaseModel):
+    # Un resultado por elemento enviado, en el mismo orden; row empieza en 1
+    row: int
+    student_id: int
+    status: str  # created | updated | rejected
+    grade_id: int | None = None
+    detail: str | None = None
+
 class GradeDto(GradeBaseDto):
     # Relaciones
     student: UserBaseDto
@@ -140,6 +197,17 @@ class CreateEvaluationDto(BaseModel):
 
 class UpdateEvaluationDto(BaseModel):
     name: Optional[str] = None
+    percentage: Optional[float] = Field(None, ge=0.0, le=100.0)
+
+class FinalGradeDto(BaseModel):
+    student_id: int
+    subject_id: int
+    weighted_average: float
+    percentage_covered: float
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
     
 
 class CreateEnrollmentDto(BaseModel):
@@ -149,6 +217,17 @@ class CreateEnrollmentDto(BaseModel):
 
 class UpdateEnrollmentDto(BaseModel):
     active: Optional[bool] = None
+
+class BulkEnrollmentItemDto(BaseModel):
+    # Se identifica al estudiante por id o por número de identificación
+    student_id: int | None = None
+    idnumber: str | None = None
+
+
+class BulkEnrollmentResultDto(BaseModel):
+    created: list[int] = []
+    skipped: list[int] = []
+    rejected: list[BulkRejectedRowDto] = []
         
 class EnrollmentDto(EnrollmentBaseDto):
     # Relaciones
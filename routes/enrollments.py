@@ -1,22 +1,106 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_db, upsert_insert
 from models.enrollment import Enrollment
-from models.subject import Subject
 from models.user import User, UserRole
 from typing import  List
 
-from routes.dtos import CreateEnrollmentDto, EnrollmentDto, UpdateEnrollmentDto
+from routes.dtos import (
+    BulkEnrollmentItemDto,
+    BulkEnrollmentResultDto,
+    BulkRejectedRowDto,
+    CreateEnrollmentDto,
+    EnrollmentDto,
+    UpdateEnrollmentDto,
+)
 
+from .authz import AccessScope, get_access_scope, mark_scopes_changed
+from .bulk import CSV_REQUEST_BODY, batches, read_csv_records
+from .caching import USER_LISTS, mark_changed, subject_tag
+from .loading import FieldParams, query_options
+from .pagination import DateRange, PageParams, paginate
+from .serialization import json_response
 from .users import get_current_user  # reutilizamos la autenticación
 
 
 router = APIRouter(prefix="/enrollments", tags=["enrollments"])
 
+# --- Matrícula masiva --- #
+
+def _require_managed_subject(db: Session, subject_id: int, scope: AccessScope):
+    # Permisos: admin o profesor dueño de la materia
+    scope.require(db, subject_id, "No tienes permiso para matricular en esta materia", manage=True)
+
+
+def _bulk_enroll(db: Session, subject_id: int, references: list[tuple[int, int | None, str | None]]):
+    # references: (fila, student_id, idnumber); se resuelve todo por conjuntos
+    result = BulkEnrollmentResultDto()
+    ids = {student_id for _, student_id, _ in references if student_id is not None}
+    idnumbers = {idnumber for _, student_id, idnumber in references if student_id is None and idnumber}
+
+    by_id, by_idnumber = {}, {}
+    lookups = [User.id.in_(batch) for batch in batches(ids)]
+    lookups += [User.idnumber.in_(batch) for batch in batches(idnumbers)]
+    for condition in lookups:
+        for student_id, idnumber in db.query(User.id, User.idnumber).filter(
+            User.role == UserRole.STUDENT, condition
+        ):
+            by_id[student_id] = student_id
+            by_idnumber[idnumber] = student_id
+
+    wanted = {}
+    for row, student_id, idnumber in references:
+        reference = str(student_id) if student_id is not None else idnumber
+        resolved = by_id.get(student_id) if student_id is not None else by_idnumber.get(idnumber)
+        if reference is None:
+            result.rejected.append(BulkRejectedRowDto(row=row, reference=None, detail="Fila sin student_id ni idnumber válido"))
+        elif resolved is None:
+            result.rejected.append(BulkRejectedRowDto(row=row, reference=reference, detail="Estudiante no encontrado"))
+        elif resolved in wanted:
+            result.skipped.append(resolved)
+        else:
+            wanted[resolved] = row
+
+    existing = set()
+    for batch in batches(wanted):
+        existing.update(student_id for (student_id,) in db.query(Enrollment.student_id).filter(
+            Enrollment.subject_id == subject_id, Enrollment.student_id.in_(batch)
+        ))
+    result.skipped.extend(student_id for student_id in wanted if student_id in existing)
+    result.created = [student_id for student_id in wanted if student_id not in existing]
+
+    stmt = upsert_insert(db, Enrollment).on_conflict_do_nothing(
+        index_elements=[Enrollment.student_id, Enrollment.subject_id]
+    )
+    try:
+        for batch in batches(result.created):
+            db.execute(stmt, [{"student_id": student_id, "subject_id": subject_id, "active": True} for student_id in batch])
+        mark_changed(db, subject_tag(subject_id), USER_LISTS)
+        mark_scopes_changed(db, result.created)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error al crear matrículas: {str(e)}")
+    return result
+
+
+def _import_enrollments(db: Session, subject_id: int, scope: AccessScope, references: list[tuple[int, int | None, str | None]]):
+    _require_managed_subject(db, subject_id, scope)
+    return _bulk_enroll(db, subject_id, references)
+
+
 # --- Endpoints --- #
 
 @router.get("/", response_model=List[EnrollmentDto])
 def list_enrollments(
+    response: Response,
+    subject_id: int | None = None,
+    student_id: int | None = None,
+    active: bool | None = None,
+    page: PageParams = Depends(),
+    dates: DateRange = Depends(),
+    sparse: FieldParams = Depends(),
     db: Session = Depends(get_db),
     curr_user: User = Depends(get_current_user)
 ):
@@ -24,11 +108,21 @@ def list_enrollments(
     if curr_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="No tienes permiso para ver todas las matrículas")
 
-    return db.query(Enrollment).all()
+    shape = sparse.resolve(Enrollment, EnrollmentDto)
+    query = db.query(Enrollment).options(*query_options(Enrollment, EnrollmentDto, shape))
+    if subject_id is not None:
+        query = query.filter(Enrollment.subject_id == subject_id)
+    if student_id is not None:
+        query = query.filter(Enrollment.student_id == student_id)
+    if active is not None:
+        query = query.filter(Enrollment.active == active)
+    query = dates.apply(query, Enrollment.enrolled_at)
+    return json_response(List[EnrollmentDto], paginate(query, Enrollment, page, response), response, shape=shape)
 
 
 @router.get("/me", response_model=List[EnrollmentDto])
 def list_my_enrollments(
+    sparse: FieldParams = Depends(),
     db: Session = Depends(get_db),
     curr_user: User = Depends(get_current_user)
 ):
@@ -36,22 +130,20 @@ def list_my_enrollments(
     if curr_user.role != UserRole.STUDENT:
         raise HTTPException(status_code=403, detail="Solo los estudiantes pueden ver sus matrículas")
 
-    return db.query(Enrollment).filter(Enrollment.student_id == curr_user.id).all()
+    shape = sparse.resolve(Enrollment, EnrollmentDto)
+    enrollments = db.query(Enrollment).options(*query_options(Enrollment, EnrollmentDto, shape)).filter(
+        Enrollment.student_id == curr_user.id
+    ).all()
+    return json_response(List[EnrollmentDto], enrollments, shape=shape)
 
 
 @router.post("/", response_model=EnrollmentDto)
 def create_enrollment(
     enrollment_data: CreateEnrollmentDto,
     db: Session = Depends(get_db),
-    curr_user: User = Depends(get_current_user)
+    scope: AccessScope = Depends(get_access_scope)
 ):
-    subject = db.query(Subject).filter(Subject.id == enrollment_data.subject_id).first()
-    if not subject:
-        raise HTTPException(status_code=404, detail="Materia no encontrada")
-
-    # Permisos: admin o profesor dueño de la materia
-    if curr_user.role != UserRole.ADMIN and curr_user.id != subject.teacher_id:
-        raise HTTPException(status_code=403, detail="No tienes permiso para matricular en esta materia")
+    _require_managed_subject(db, enrollment_data.subject_id, scope)
 
     # Evitar duplicados
     existing = db.query(Enrollment).filter(
@@ -76,35 +168,67 @@ def create_enrollment(
 
     return enrollment
 
+@router.post("/subject/{subject_id}/bulk", response_model=BulkEnrollmentResultDto)
+def bulk_create_enrollments(
+    subject_id: int,
+    items: List[BulkEnrollmentItemDto],
+    db: Session = Depends(get_db),
+    scope: AccessScope = Depends(get_access_scope)
+):
+    _require_managed_subject(db, subject_id, scope)
+    references = [(row, item.student_id, item.idnumber) for row, item in enumerate(items, start=1)]
+    return _bulk_enroll(db, subject_id, references)
+
+
+@router.post(
+    "/subject/{subject_id}/bulk/csv",
+    response_model=BulkEnrollmentResultDto,
+    openapi_extra=CSV_REQUEST_BODY,
+)
+async def import_enrollments_csv(
+    subject_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    scope: AccessScope = Depends(get_access_scope)
+):
+    references = []
+    for row, record in await read_csv_records(request, required_any=("student_id", "idnumber")):
+        student_id, idnumber = record.get("student_id") or None, record.get("idnumber") or None
+        if student_id is not None and not student_id.isdigit():
+            student_id = None  # se intenta con idnumber, si la fila lo trae
+        references.append((row, int(student_id) if student_id else None, idnumber))
+    # La sesión es síncrona: permisos y matrículas en una sola llamada al threadpool, en el mismo hilo
+    return await run_in_threadpool(_import_enrollments, db, subject_id, scope, references)
+
 @router.get("/subject/{subject_id}", response_model=List[EnrollmentDto])
 def list_enrollments_of_subject(
     subject_id: int,
+    sparse: FieldParams = Depends(),
     db: Session = Depends(get_db),
-    curr_user: User = Depends(get_current_user)
+    scope: AccessScope = Depends(get_access_scope)
 ):
-    subject = db.query(Subject).filter(Subject.id == subject_id).first()
-    if not subject:
-        raise HTTPException(status_code=404, detail="Materia no encontrada")
-
     # Permisos: admin o profesor dueño de la materia
-    if curr_user.role != UserRole.ADMIN and curr_user.id != subject.teacher_id:
-        raise HTTPException(status_code=403, detail="No tienes permiso para ver las matrículas de esta materia")
+    scope.require(db, subject_id, "No tienes permiso para ver las matrículas de esta materia", manage=True)
 
-    return db.query(Enrollment).filter(Enrollment.subject_id == subject_id).all()
+    shape = sparse.resolve(Enrollment, EnrollmentDto)
+    enrollments = db.query(Enrollment).options(*query_options(Enrollment, EnrollmentDto, shape)).filter(
+        Enrollment.subject_id == subject_id
+    ).all()
+    return json_response(List[EnrollmentDto], enrollments, shape=shape)
 
 @router.put("/{enrollment_id}", response_model=EnrollmentDto)
 def update_enrollment(
     enrollment_id: int,
     enrollment_data: UpdateEnrollmentDto,
     db: Session = Depends(get_db),
-    curr_user: User = Depends(get_current_user)
+    scope: AccessScope = Depends(get_access_scope)
 ):
     enrollment = db.query(Enrollment).filter(Enrollment.id == enrollment_id).first()
     if not enrollment:
         raise HTTPException(status_code=404, detail="Matrícula no encontrada")
 
     # Permisos: admin o profesor dueño de la materia
-    if curr_user.role != UserRole.ADMIN and curr_user.id != enrollment.subject.teacher_id:
+    if not scope.can_manage(enrollment.subject_id):
         raise HTTPException(status_code=403, detail="No tienes permiso para actualizar esta matrícula")
 
     if enrollment_data.active is not None:
@@ -124,14 +248,14 @@ def update_enrollment(
 def delete_enrollment(
     enrollment_id: int,
     db: Session = Depends(get_db),
-    curr_user: User = Depends(get_current_user)
+    scope: AccessScope = Depends(get_access_scope)
 ):
     enrollment = db.query(Enrollment).filter(Enrollment.id == enrollment_id).first()
     if not enrollment:
         raise HTTPException(status_code=404, detail="Matrícula no encontrada")
 
     # Permisos: admin o profesor dueño de la materia
-    if curr_user.role != UserRole.ADMIN and curr_user.id != enrollment.subject.teacher_id:
+    if not scope.can_manage(enrollment.subject_id):
         raise HTTPException(status_code=403, detail="No tienes permiso para eliminar esta matrícula")
 
     try:
@@ -1,13 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from database import get_db
+from grading import refresh_final_grades
 from models.evaluation import Evaluation
+from models.grade import Grade
 from models.subject import Subject
-from models.user import User, UserRole
+from models.user import User
 from typing import List
 
 from routes.dtos import CreateEvaluationDto, EvaluationDto, UpdateEvaluationDto
 
+from .authz import AccessScope, get_access_scope
+from .caching import cached_response, subject_tag
+from .conditional import conditional_get, probe
+from .loading import FieldParams, query_options
+from .pagination import DateRange, PageParams, paginate
+from .serialization import json_response
 from .users import get_current_user  # para autenticar
 
 router = APIRouter(prefix="/evaluations", tags=["evaluations"])
@@ -16,25 +25,34 @@ router = APIRouter(prefix="/evaluations", tags=["evaluations"])
 # --- Endpoints --- #
 @router.get("/", response_model=List[EvaluationDto])
 def list_evaluations(
+    response: Response,
+    subject_id: int | None = None,
+    page: PageParams = Depends(),
+    dates: DateRange = Depends(),
+    sparse: FieldParams = Depends(),
     db: Session = Depends(get_db),
-    curr_user: User = Depends(get_current_user)
+    scope: AccessScope = Depends(get_access_scope)
 ):
-    return db.query(Evaluation).all()
+    shape = sparse.resolve(Evaluation, EvaluationDto)
+    query = db.query(Evaluation).options(*query_options(Evaluation, EvaluationDto, shape)).filter(
+        *scope.restrict(Evaluation.subject_id)
+    )
+    if subject_id is not None:
+        query = query.filter(Evaluation.subject_id == subject_id)
+    query = dates.apply(query, Evaluation.created_at)
+    return json_response(List[EvaluationDto], paginate(query, Evaluation, page, response), response, shape=shape)
 
 
 @router.post("/", response_model=EvaluationDto)
 def create_evaluation(
     evaluation_data: CreateEvaluationDto,
     db: Session = Depends(get_db),
-    curr_user: User = Depends(get_current_user)
+    scope: AccessScope = Depends(get_access_scope)
 ):
     # Solo Admins o el profesor dueño de la materia pueden crear evaluaciones
-    subject = db.query(Subject).filter(Subject.id == evaluation_data.subject_id).first()
-    if not subject:
-        raise HTTPException(status_code=404, detail="Materia no encontrada")
-
-    if curr_user.role != UserRole.ADMIN and curr_user.id != subject.teacher_id:
-        raise HTTPException(status_code=403, detail="No tienes permiso para crear evaluaciones en esta materia")
+    scope.require(
+        db, evaluation_data.subject_id, "No tienes permiso para crear evaluaciones en esta materia", manage=True
+    )
 
     evaluation = Evaluation(
         name=evaluation_data.name,
@@ -55,34 +73,46 @@ def create_evaluation(
 @router.get("/subject/{subject_id}", response_model=List[EvaluationDto])
 def list_evaluations_by_subject(
     subject_id: int,
+    request: Request,
+    response: Response,
+    sparse: FieldParams = Depends(),
     db: Session = Depends(get_db),
-    curr_user: User = Depends(get_current_user)
+    curr_user: User = Depends(get_current_user),
+    scope: AccessScope = Depends(get_access_scope)
 ):
-    subject = db.query(Subject).filter(Subject.id == subject_id).first()
-    if not subject:
-        raise HTTPException(status_code=404, detail="Materia no encontrada")
-
     # Permisos: solo admin, profesor dueño de la materia o estudiantes matriculados
-    if curr_user.role != UserRole.ADMIN and curr_user.id != subject.teacher_id:
-        enrollment = db.query(Subject).join(Subject.enrollments).filter(
-            Subject.id == subject_id,
-            Subject.enrollments.any(student_id=curr_user.id)
-        ).first()
-        if not enrollment:
-            raise HTTPException(status_code=403, detail="No tienes permiso para ver las evaluaciones de esta materia")
-
-    return db.query(Evaluation).filter(Evaluation.subject_id == subject_id).all()
+    scope.require(db, subject_id, "No tienes permiso para ver las evaluaciones de esta materia")
+    shape = sparse.resolve(Evaluation, EvaluationDto)
+
+    conditional_get(request, response, db, [
+        probe(Evaluation, Evaluation.subject_id == subject_id),
+        probe(Subject, Subject.id == subject_id),
+        probe(Grade, Grade.evaluation_id.in_(select(Evaluation.id).where(Evaluation.subject_id == subject_id))),
+    ], scope=curr_user.id)
+    return cached_response(
+        request, response, List[EvaluationDto], "subject", [subject_tag(subject_id)],
+        lambda: db.query(Evaluation).options(*query_options(Evaluation, EvaluationDto, shape)).filter(
+            Evaluation.subject_id == subject_id
+        ).all(),
+        shape=shape,
+    )
 
 @router.get("/{evaluation_id}", response_model=EvaluationDto)
 def get_evaluation(
     evaluation_id: int,
+    sparse: FieldParams = Depends(),
     db: Session = Depends(get_db),
-    curr_user: User = Depends(get_current_user)
+    scope: AccessScope = Depends(get_access_scope)
 ):
-    evaluation = db.query(Evaluation).filter(Evaluation.id == evaluation_id).first()
+    shape = sparse.resolve(Evaluation, EvaluationDto)
+    evaluation = db.query(Evaluation).options(*query_options(Evaluation, EvaluationDto, shape)).filter(
+        Evaluation.id == evaluation_id
+    ).first()
     if not evaluation:
         raise HTTPException(status_code=404, detail="Evaluación no encontrada")
-    return evaluation
+    if not scope.can_view(evaluation.subject_id):
+        raise HTTPException(status_code=403, detail="No tienes permiso para ver esta evaluación")
+    return json_response(EvaluationDto, evaluation, shape=shape)
 
 
 @router.put("/{evaluation_id}", response_model=EvaluationDto)
@@ -90,20 +120,29 @@ def update_evaluation(
     evaluation_id: int,
     evaluation_data: UpdateEvaluationDto,
     db: Session = Depends(get_db),
-    curr_user: User = Depends(get_current_user)
+    scope: AccessScope = Depends(get_access_scope)
 ):
     evaluation = db.query(Evaluation).filter(Evaluation.id == evaluation_id).first()
     if not evaluation:
         raise HTTPException(status_code=404, detail="Evaluación no encontrada")
 
     # Permisos: solo admin o profesor dueño de la materia
-    if curr_user.role != UserRole.ADMIN and curr_user.id != evaluation.subject.teacher_id:
+    if not scope.can_manage(evaluation.subject_id):
         raise HTTPException(status_code=403, detail="No tienes permiso para actualizar esta evaluación")
 
     if evaluation_data.name is not None:
         evaluation.name = evaluation_data.name
+    percentage_changed = (
+        evaluation_data.percentage is not None and evaluation_data.percentage != evaluation.percentage
+    )
+    if percentage_changed:
+        evaluation.percentage = evaluation_data.percentage
 
     try:
+        if percentage_changed:
+            # Cambia el peso de la evaluación: se recalcula toda la materia
+            db.flush()
+            refresh_final_grades(db, evaluation.subject_id)
         db.commit()
         db.refresh(evaluation)
     except Exception as e:
@@ -117,18 +156,21 @@ def update_evaluation(
 def delete_evaluation(
     evaluation_id: int,
     db: Session = Depends(get_db),
-    curr_user: User = Depends(get_current_user)
+    scope: AccessScope = Depends(get_access_scope)
 ):
     evaluation = db.query(Evaluation).filter(Evaluation.id == evaluation_id).first()
     if not evaluation:
         raise HTTPException(status_code=404, detail="Evaluación no encontrada")
 
     # Permisos: solo admin o profesor dueño de la materia
-    if curr_user.role != UserRole.ADMIN and curr_user.id != evaluation.subject.teacher_id:
+    if not scope.can_manage(evaluation.subject_id):
         raise HTTPException(status_code=403, detail="No tienes permiso para eliminar esta evaluación")
 
+    subject_id = evaluation.subject_id
     try:
         db.delete(evaluation)
+        db.flush()
+        refresh_final_grades(db, subject_id)
         db.commit()
     except Exception as e:
         db.rollback()
@@ -0,0 +1,155 @@
+import csv
+import enum
+import io
+import json
+from datetime import datetime
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from database import read_engine
+from models.enrollment import Enrollment
+from models.evaluation import Evaluation
+from models.grade import Grade
+from models.subject import Subject
+from models.user import User, UserRole
+
+from .pagination import DateRange
+from .users import get_current_user  # autenticación
+
+
+router = APIRouter(prefix="/exports", tags=["exports"])
+
+# Filas leídas del cursor del servidor por lote; la memoria no depende del tamaño de la tabla
+EXPORT_BATCH_SIZE = 1000
+
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# --- Generación en streaming --- #
+
+def _format(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _stream_rows(stmt, fmt):
+    # Conexión propia: el generador sigue leyendo después de que el handler retorna
+    with read_engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE).execute(stmt)
+        columns = list(result.keys())
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if fmt == "csv":
+            writer.writerow(columns)
+        for rows in result.partitions():
+            for row in rows:
+                values = [_format(value) for value in row]
+                if fmt == "csv":
+                    writer.writerow(values)
+                else:
+                    buffer.write(json.dumps(dict(zip(columns, values)), ensure_ascii=False))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+
+def _export(stmt, name, fmt):
+    return StreamingResponse(
+        _stream_rows(stmt, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
+
+
+def _require_admin(curr_user: User):
+    if curr_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="No tienes permiso para exportar datos")
+
+# --- Endpoints --- #
+
+@router.get("/grades")
+def export_grades(
+    format: Literal["csv", "ndjson"] = "csv",
+    subject_id: int | None = None,
+    student_id: int | None = None,
+    dates: DateRange = Depends(),
+    curr_user: User = Depends(get_current_user)
+):
+    _require_admin(curr_user)
+    stmt = select(
+        Grade.id,
+        Grade.student_id,
+        User.idnumber.label("student_idnumber"),
+        User.name.label("student_name"),
+        Evaluation.subject_id,
+        Subject.name.label("subject_name"),
+        Grade.evaluation_id,
+        Evaluation.name.label("evaluation_name"),
+        Evaluation.percentage,
+        Grade.score,
+        Grade.created_at,
+        Grade.updated_at,
+    ).join(User, User.id == Grade.student_id).join(
+        Evaluation, Evaluation.id == Grade.evaluation_id
+    ).join(Subject, Subject.id == Evaluation.subject_id).order_by(Grade.id)
+    if subject_id is not None:
+        stmt = stmt.where(Evaluation.subject_id == subject_id)
+    if student_id is not None:
+        stmt = stmt.where(Grade.student_id == student_id)
+    return _export(dates.apply(stmt, Grade.created_at), "grades", format)
+
+
+@router.get("/enrollments")
+def export_enrollments(
+    format: Literal["csv", "ndjson"] = "csv",
+    subject_id: int | None = None,
+    student_id: int | None = None,
+    dates: DateRange = Depends(),
+    curr_user: User = Depends(get_current_user)
+):
+    _require_admin(curr_user)
+    stmt = select(
+        Enrollment.id,
+        Enrollment.student_id,
+        User.idnumber.label("student_idnumber"),
+        User.name.label("student_name"),
+        Enrollment.subject_id,
+        Subject.name.label("subject_name"),
+        Enrollment.active,
+        Enrollment.enrolled_at,
+        Enrollment.updated_at,
+    ).join(User, User.id == Enrollment.student_id).join(
+        Subject, Subject.id == Enrollment.subject_id
+    ).order_by(Enrollment.id)
+    if subject_id is not None:
+        stmt = stmt.where(Enrollment.subject_id == subject_id)
+    if student_id is not None:
+        stmt = stmt.where(Enrollment.student_id == student_id)
+    return _export(dates.apply(stmt, Enrollment.enrolled_at), "enrollments", format)
+
+
+@router.get("/users")
+def export_users(
+    format: Literal["csv", "ndjson"] = "csv",
+    role: UserRole | None = None,
+    subject_id: int | None = None,
+    dates: DateRange = Depends(),
+    curr_user: User = Depends(get_current_user)
+):
+    _require_admin(curr_user)
+    stmt = select(
+        User.id, User.name, User.email, User.idnumber, User.role, User.age, User.active, User.created_at, User.updated_at
+    ).order_by(User.id)
+    if role is not None:
+        stmt = stmt.where(User.role == role)
+    if subject_id is not None:
+        # Estudiantes matriculados en la materia
+        stmt = stmt.where(User.id.in_(select(Enrollment.student_id).where(Enrollment.subject_id == subject_id)))
+    return _export(dates.apply(stmt, User.created_at), "users", format)
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from database import get_db
+from models.final_grade import FinalGrade
+from models.user import User, UserRole
+from typing import List
+
+from routes.dtos import FinalGradeDto
+from .authz import AccessScope, get_access_scope
+from .users import get_current_user  # autenticación
+
+
+router = APIRouter(prefix="/final-grades", tags=["final-grades"])
+
+# --- Endpoints --- #
+
+@router.get("/me", response_model=List[FinalGradeDto])
+def list_my_final_grades(
+    db: Session = Depends(get_db),
+    curr_user: User = Depends(get_current_user)
+):
+    if curr_user.role != UserRole.STUDENT:
+        raise HTTPException(status_code=403, detail="Solo los estudiantes pueden ver sus notas definitivas")
+    return db.query(FinalGrade).filter(FinalGrade.student_id == curr_user.id).order_by(FinalGrade.subject_id).all()
+
+
+@router.get("/subject/{subject_id}", response_model=List[FinalGradeDto])
+def list_final_grades_by_subject(
+    subject_id: int,
+    db: Session = Depends(get_db),
+    curr_user: User = Depends(get_current_user),
+    scope: AccessScope = Depends(get_access_scope)
+):
+    # Permisos: admin y profesor dueño ven todo; el estudiante matriculado solo la suya
+    scope.require(db, subject_id, "No tienes permiso para ver estas notas")
+    query = db.query(FinalGrade).filter(FinalGrade.subject_id == subject_id)
+    if not scope.can_manage(subject_id):
+        query = query.filter(FinalGrade.student_id == curr_user.id)
+
+    return query.order_by(FinalGrade.student_id).all()
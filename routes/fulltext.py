@@ -0,0 +1,66 @@
+import re
+
+from fastapi import HTTPException
+from sqlalchemy import and_, column, func, literal_column, or_, select, table
+from models.subject import Subject
+from models.user import User
+
+# ----------------------
+# Búsqueda de texto completo
+# ----------------------
+# En SQLite se consulta el índice FTS5 (migración v004) que los triggers
+# mantienen sincronizado; cada palabra del texto buscado se usa como prefijo
+# ("gar" encuentra "García") y todas deben aparecer. El ranking es bm25 con
+# más peso en el nombre. En otros motores se recurre a LIKE sin ranking.
+
+MAX_TERMS = 8
+_TERM = re.compile(r"\w+")
+
+
+class FullTextIndex:
+    def __init__(self, model, columns, weights):
+        self.model = model
+        self.columns = [getattr(model, name) for name in columns]
+        self.weights = weights
+        self.name = f"{model.__tablename__}_fts"
+        self.table = table(self.name, column("rowid"))
+
+    def _match(self, terms):
+        expression = " ".join(f'"{term}"*' for term in terms)
+        return literal_column(self.name).op("MATCH")(expression)
+
+    def _like(self, terms):
+        return and_(*(
+            or_(*(func.lower(col).contains(term, autoescape=True) for col in self.columns)) for term in terms
+        ))
+
+    def filter(self, db, q: str):
+        # Criterio para combinar con otros filtros y con la paginación por id
+        terms = search_terms(q)
+        if db.get_bind().dialect.name != "sqlite":
+            return self._like(terms)
+        return self.model.id.in_(select(self.table.c.rowid).where(self._match(terms)))
+
+    def ranked(self, db, q: str, limit: int, *criteria, options=()):
+        # Mejores coincidencias primero (bm25: menor es mejor)
+        terms = search_terms(q)
+        query = db.query(self.model).options(*options).filter(*criteria)
+        if db.get_bind().dialect.name != "sqlite":
+            return query.filter(self._like(terms)).order_by(self.model.id).limit(limit).all()
+        hits = (
+            select(self.table.c.rowid.label("id"), func.bm25(literal_column(self.name), *self.weights).label("score"))
+            .where(self._match(terms))
+            .subquery()
+        )
+        return query.join(hits, hits.c.id == self.model.id).order_by(hits.c.score, self.model.id).limit(limit).all()
+
+
+def search_terms(q: str):
+    terms = _TERM.findall(q.lower())[:MAX_TERMS]
+    if not terms:
+        raise HTTPException(status_code=400, detail="La búsqueda debe contener al menos una palabra")
+    return terms
+
+
+users_index = FullTextIndex(User, ("name", "email", "idnumber"), (10.0, 5.0, 5.0))
+subjects_index = FullTextIndex(Subject, ("name", "description"), (10.0, 1.0))
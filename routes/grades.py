@@ -1,52 +1,102 @@
-from fastapi import APIRouter, Depends, HTTPException
+from collections import Counter
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_db, upsert_insert
+from grading import refresh_final_grades
+from models.enrollment import Enrollment
 from models.grade import Grade
 from models.evaluation import Evaluation
-from models.subject import Subject
 from models.user import User, UserRole
 from typing import List
 
-from routes.dtos import CreateGradeDto, GradeDto, UpdateGradeDto
+from routes.dtos import BulkGradeItemDto, BulkGradeResultDto, CreateGradeDto, GradeDto, UpdateGradeDto
+from .authz import AccessScope, get_access_scope
+from .caching import USER_LISTS, USER_ROWS, cached_response, mark_changed, subject_tag
+from .conditional import conditional_get, probe
+from .loading import FieldParams, query_options
+from .pagination import DateRange, PageParams, paginate
+from .serialization import json_response
 from .users import get_current_user  # autenticación
 
 
 router = APIRouter(prefix="/grades", tags=["grades"])
 
+# --- Consultas auxiliares --- #
+
+def _evaluation_subject_id(db: Session, evaluation_id: int):
+    subject_id = db.scalar(select(Evaluation.subject_id).where(Evaluation.id == evaluation_id))
+    if subject_id is None:
+        raise HTTPException(status_code=404, detail="Evaluación no encontrada")
+    return subject_id
+
+
+def _grade_with_subject_id(db: Session, grade_id: int):
+    # La nota y la materia de su evaluación en una sola consulta
+    row = db.query(Grade, Evaluation.subject_id).join(Grade.evaluation).filter(Grade.id == grade_id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Nota no encontrada")
+    return row
+
 # --- Endpoints --- #
 
 @router.get("/", response_model=List[GradeDto])
 def list_grades(
+    request: Request,
+    response: Response,
+    subject_id: int | None = None,
+    evaluation_id: int | None = None,
+    student_id: int | None = None,
+    page: PageParams = Depends(),
+    dates: DateRange = Depends(),
+    sparse: FieldParams = Depends(),
     db: Session = Depends(get_db),
-    curr_user: User = Depends(get_current_user)
+    curr_user: User = Depends(get_current_user),
+    scope: AccessScope = Depends(get_access_scope)
 ):
+    shape = sparse.resolve(Grade, GradeDto)
+    criteria = []
     if curr_user.role == UserRole.STUDENT:
         # Un estudiante solo puede ver sus notas
-        return db.query(Grade).filter(Grade.student_id == curr_user.id).all()
-    if curr_user.role == UserRole.TEACHER:
+        criteria.append(Grade.student_id == curr_user.id)
+    elif curr_user.role == UserRole.TEACHER:
         # Un profesor solo puede ver las notas de sus materias
-        return db.query(Grade).join(Grade.evaluation).join(Evaluation.subject).filter(
-            Subject.teacher_id == curr_user.id
-        ).all()
-    return db.query(Grade).all()
+        criteria.append(Grade.evaluation_id.in_(select(Evaluation.id).where(*scope.restrict(Evaluation.subject_id))))
+
+    if subject_id is not None:
+        criteria.append(Grade.evaluation_id.in_(select(Evaluation.id).where(Evaluation.subject_id == subject_id)))
+    if evaluation_id is not None:
+        criteria.append(Grade.evaluation_id == evaluation_id)
+    if student_id is not None:
+        criteria.append(Grade.student_id == student_id)
+
+    # GradeDto incluye el estudiante y la evaluación de cada nota
+    grade_rows = dates.apply(
+        select(Grade.id, Grade.student_id, Grade.evaluation_id).where(*criteria), Grade.created_at
+    ).subquery()
+    conditional_get(request, response, db, [
+        probe(Grade, Grade.id.in_(select(grade_rows.c.id))),
+        probe(User, User.id.in_(select(grade_rows.c.student_id))),
+        probe(Evaluation, Evaluation.id.in_(select(grade_rows.c.evaluation_id))),
+    ], scope=curr_user.id)
+
+    query = db.query(Grade).options(*query_options(Grade, GradeDto, shape)).filter(*criteria)
+    query = dates.apply(query, Grade.created_at)
+    return json_response(List[GradeDto], paginate(query, Grade, page, response), response, shape=shape)
 
 
 @router.post("/", response_model=GradeDto)
 def create_grade(
     grade_data: CreateGradeDto,
     db: Session = Depends(get_db),
-    curr_user: User = Depends(get_current_user)
+    scope: AccessScope = Depends(get_access_scope)
 ):
-    evaluation = db.query(Evaluation).filter(Evaluation.id == grade_data.evaluation_id).first()
-    if not evaluation:
-        raise HTTPException(status_code=404, detail="Evaluación no encontrada")
-
-    subject = db.query(Subject).filter(Subject.id == evaluation.subject_id).first()
-    if not subject:
-        raise HTTPException(status_code=404, detail="Materia no encontrada")
+    subject_id = _evaluation_subject_id(db, grade_data.evaluation_id)
 
     # Solo admin o profesor dueño de la materia
-    if curr_user.role != UserRole.ADMIN and curr_user.id != subject.teacher_id:
+    if not scope.can_manage(subject_id):
         raise HTTPException(status_code=403, detail="No tienes permiso para asignar notas en esta materia")
 
     grade = Grade(
@@ -57,8 +107,13 @@ def create_grade(
 
     try:
         db.add(grade)
+        db.flush()
+        refresh_final_grades(db, subject_id, [grade.student_id])
         db.commit()
         db.refresh(grade)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="El estudiante ya tiene una nota en esta evaluación")
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al crear nota: {str(e)}")
@@ -68,77 +123,145 @@ def create_grade(
 @router.get("/evaluation/{evaluation_id}", response_model=List[GradeDto])
 def list_grades_by_evaluation(
     evaluation_id: int,
+    sparse: FieldParams = Depends(),
     db: Session = Depends(get_db),
-    curr_user: User = Depends(get_current_user)
+    curr_user: User = Depends(get_current_user),
+    scope: AccessScope = Depends(get_access_scope)
+):
+    subject_id = _evaluation_subject_id(db, evaluation_id)
+
+    # Permisos: solo admin, profesor dueño de la materia o estudiantes matriculados
+    if not scope.can_view(subject_id):
+        raise HTTPException(status_code=403, detail="No tienes permiso para ver estas notas")
+    shape = sparse.resolve(Grade, GradeDto)
+    query = db.query(Grade).options(*query_options(Grade, GradeDto, shape)).filter(Grade.evaluation_id == evaluation_id)
+    if not scope.can_manage(subject_id):
+        query = query.filter(Grade.student_id == curr_user.id)
+    return json_response(List[GradeDto], query.all(), shape=shape)
+
+@router.post("/evaluation/{evaluation_id}/bulk", response_model=List[BulkGradeResultDto])
+def bulk_upsert_grades(
+    evaluation_id: int,
+    items: List[BulkGradeItemDto],
+    db: Session = Depends(get_db),
+    scope: AccessScope = Depends(get_access_scope)
 ):
     evaluation = db.query(Evaluation).filter(Evaluation.id == evaluation_id).first()
     if not evaluation:
         raise HTTPException(status_code=404, detail="Evaluación no encontrada")
 
-    subject = db.query(Subject).filter(Subject.id == evaluation.subject_id).first()
-    if not subject:
-        raise HTTPException(status_code=404, detail="Materia no encontrada")
+    # Solo admin o profesor dueño de la materia (se verifica una sola vez)
+    if not scope.can_manage(evaluation.subject_id):
+        raise HTTPException(status_code=403, detail="No tienes permiso para asignar notas en esta materia")
 
-    # Permisos: solo admin, profesor dueño de la materia o estudiantes matriculados
-    if curr_user.role != UserRole.ADMIN and curr_user.id != subject.teacher_id:
-        if curr_user.role == UserRole.STUDENT:
-            enrollment = db.query(Subject).join(Subject.enrollments).filter(
-                Subject.id == subject.id,
-                Subject.enrollments.any(student_id=curr_user.id)
-            ).first()
-            if not enrollment:
-                raise HTTPException(status_code=403, detail="No tienes permiso para ver estas notas")
-            return db.query(Grade).filter(
-                Grade.evaluation_id == evaluation_id,
-                Grade.student_id == curr_user.id
-            ).all()
+    student_ids = {item.student_id for item in items}
+    enrolled = {
+        student_id for (student_id,) in db.query(Enrollment.student_id).filter(
+            Enrollment.subject_id == evaluation.subject_id,
+            Enrollment.student_id.in_(student_ids),
+            Enrollment.active == True,
+        )
+    }
+    existing = {
+        student_id for (student_id,) in db.query(Grade.student_id).filter(
+            Grade.evaluation_id == evaluation_id,
+            Grade.student_id.in_(student_ids),
+        )
+    }
+
+    repeated = {student_id for student_id, count in Counter(item.student_id for item in items).items() if count > 1}
+    results, rows = [], []
+    for row, item in enumerate(items, start=1):
+        if item.student_id in repeated:
+            # Un repetido invalida todas sus apariciones
+            result = BulkGradeResultDto(
+                row=row, student_id=item.student_id, status="rejected", detail="Estudiante repetido en la solicitud"
+            )
+        elif item.student_id not in enrolled:
+            result = BulkGradeResultDto(
+                row=row, student_id=item.student_id, status="rejected",
+                detail="El estudiante no está matriculado en la materia",
+            )
         else:
-            raise HTTPException(status_code=403, detail="No tienes permiso para ver estas notas")
-
-    return db.query(Grade).filter(Grade.evaluation_id == evaluation_id).all()
+            result = BulkGradeResultDto(
+                row=row, student_id=item.student_id, status="updated" if item.student_id in existing else "created"
+            )
+            rows.append({"student_id": item.student_id, "evaluation_id": evaluation_id, "score": item.score})
+        results.append(result)
+
+    if rows:
+        stmt = upsert_insert(db, Grade)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Grade.student_id, Grade.evaluation_id],
+            set_={"score": stmt.excluded.score, "updated_at": func.now()},
+        )
+        try:
+            db.execute(stmt, rows)
+            refresh_final_grades(db, evaluation.subject_id, [row["student_id"] for row in rows])
+            mark_changed(db, subject_tag(evaluation.subject_id), USER_LISTS)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(status_code=500, detail=f"Error al guardar notas: {str(e)}")
+
+        grade_ids = dict(db.query(Grade.student_id, Grade.id).filter(
+            Grade.evaluation_id == evaluation_id,
+            Grade.student_id.in_([row["student_id"] for row in rows]),
+        ))
+        for result in results:
+            if result.status != "rejected":
+                result.grade_id = grade_ids.get(result.student_id)
+
+    return results
 
 @router.get("/subject/{subject_id}", response_model=List[GradeDto])
 def list_grades_by_subject(
     subject_id: int,
+    request: Request,
+    response: Response,
+    sparse: FieldParams = Depends(),
     db: Session = Depends(get_db),
-    curr_user: User = Depends(get_current_user)
+    curr_user: User = Depends(get_current_user),
+    scope: AccessScope = Depends(get_access_scope)
 ):
-    subject = db.query(Subject).filter(Subject.id == subject_id).first()
-    if not subject:
-        raise HTTPException(status_code=404, detail="Materia no encontrada")
-
     # Permisos: solo admin, profesor dueño de la materia o estudiantes matriculados
-    if curr_user.role != UserRole.ADMIN and curr_user.id != subject.teacher_id:
-        if curr_user.role == UserRole.STUDENT:
-            enrollment = db.query(Subject).join(Subject.enrollments).filter(
-                Subject.id == subject_id,
-                Subject.enrollments.any(student_id=curr_user.id)
-            ).first()
-            if not enrollment:
-                raise HTTPException(status_code=403, detail="No tienes permiso para ver estas notas")
-            return db.query(Grade).join(Grade.evaluation).filter(
+    scope.require(db, subject_id, "No tienes permiso para ver estas notas")
+    shape = sparse.resolve(Grade, GradeDto)
+    if not scope.can_manage(subject_id):
+        # Matriculado: solo ve sus propias notas, alcance por usuario
+        return cached_response(
+            request, response, List[GradeDto], curr_user.id, [subject_tag(subject_id), USER_ROWS],
+            lambda: db.query(Grade).options(*query_options(Grade, GradeDto, shape)).join(Grade.evaluation).filter(
                 Evaluation.subject_id == subject_id,
                 Grade.student_id == curr_user.id
-            ).all()
-        else:
-            raise HTTPException(status_code=403, detail="No tienes permiso para ver estas notas")
-
-    return db.query(Grade).join(Grade.evaluation).filter(Evaluation.subject_id == subject_id).all()
+            ).all(),
+            shape=shape,
+        )
+
+    return cached_response(
+        request, response, List[GradeDto], "subject", [subject_tag(subject_id), USER_ROWS],
+        lambda: db.query(Grade).options(*query_options(Grade, GradeDto, shape)).join(Grade.evaluation).filter(
+            Evaluation.subject_id == subject_id
+        ).all(),
+        shape=shape,
+    )
 
 @router.get("/{grade_id}", response_model=GradeDto)
 def get_grade(
     grade_id: int,
+    sparse: FieldParams = Depends(),
     db: Session = Depends(get_db),
     curr_user: User = Depends(get_current_user)
 ):
-    grade = db.query(Grade).filter(Grade.id == grade_id).first()
+    shape = sparse.resolve(Grade, GradeDto)
+    grade = db.query(Grade).options(*query_options(Grade, GradeDto, shape)).filter(Grade.id == grade_id).first()
     if not grade:
         raise HTTPException(status_code=404, detail="Nota no encontrada")
 
     if curr_user.role == UserRole.STUDENT and grade.student_id != curr_user.id:
         raise HTTPException(status_code=403, detail="No tienes permiso para ver esta nota")
 
-    return grade
+    return json_response(GradeDto, grade, shape=shape)
 
 
 @router.put("/{grade_id}", response_model=GradeDto)
@@ -146,24 +269,20 @@ def update_grade(
     grade_id: int,
     grade_data: UpdateGradeDto,
     db: Session = Depends(get_db),
-    curr_user: User = Depends(get_current_user)
+    scope: AccessScope = Depends(get_access_scope)
 ):
-    grade = db.query(Grade).filter(Grade.id == grade_id).first()
-    if not grade:
-        raise HTTPException(status_code=404, detail="Nota no encontrada")
-
-    subject = db.query(Subject).filter(Subject.id == grade.evaluation.subject_id).first()
-    if not subject:
-        raise HTTPException(status_code=404, detail="Materia no encontrada")
+    grade, subject_id = _grade_with_subject_id(db, grade_id)
 
     # Solo admin o profesor dueño de la materia
-    if curr_user.role != UserRole.ADMIN and curr_user.id != subject.teacher_id:
+    if not scope.can_manage(subject_id):
         raise HTTPException(status_code=403, detail="No tienes permiso para actualizar esta nota")
 
     if grade_data.score is not None:
         grade.score = grade_data.score
 
     try:
+        db.flush()
+        refresh_final_grades(db, subject_id, [grade.student_id])
         db.commit()
         db.refresh(grade)
     except Exception as e:
@@ -177,22 +296,18 @@ def update_grade(
 def delete_grade(
     grade_id: int,
     db: Session = Depends(get_db),
-    curr_user: User = Depends(get_current_user)
+    scope: AccessScope = Depends(get_access_scope)
 ):
-    grade = db.query(Grade).filter(Grade.id == grade_id).first()
-    if not grade:
-        raise HTTPException(status_code=404, detail="Nota no encontrada")
-
-    subject = db.query(Subject).filter(Subject.id == grade.evaluation.subject_id).first()
-    if not subject:
-        raise HTTPException(status_code=404, detail="Materia no encontrada")
+    grade, subject_id = _grade_with_subject_id(db, grade_id)
 
     # Solo admin o profesor dueño de la materia
-    if curr_user.role != UserRole.ADMIN and curr_user.id != subject.teacher_id:
+    if not scope.can_manage(subject_id):
         raise HTTPException(status_code=403, detail="No tienes permiso para eliminar esta nota")
 
     try:
         db.delete(grade)
+        db.flush()
+        refresh_final_grades(db, subject_id, [grade.student_id])
         db.commit()
     except Exception as e:
         db.rollback()
@@ -0,0 +1,175 @@
+from functools import lru_cache
+from types import UnionType
+from typing import Union, get_args, get_origin
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, load_only, raiseload, selectinload
+
+# ----------------------
+# Planificador de carga de relaciones
+# ----------------------
+# Recorre el árbol de un DTO de routes/dtos.py y arma las opciones de carga
+# de SQLAlchemy para que cada relación anidada se traiga con un número fijo
+# de consultas, sin importar cuántas filas devuelva el endpoint:
+#   - colecciones (uselist) -> selectinload, una consulta por nivel
+#   - muchos-a-uno          -> joinedload, en la misma consulta del padre
+# La relación inversa de la que se acaba de recorrer (p. ej. evaluation.subject
+# dentro de subject.evaluations) se omite: el identity map ya la resuelve.
+
+
+def _nested_dto(annotation):
+    # Extrae el DTO de anotaciones como `UserBaseDto`, `list[GradeBaseDto]`
+    # o `SubjectBaseDto | None`.
+    origin = get_origin(annotation)
+    if origin in (list, tuple, set, Union, UnionType):
+        for arg in get_args(annotation):
+            dto = _nested_dto(arg)
+            if dto is not None:
+                return dto
+        return None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    return None
+
+
+def _is_backref(rel, parent):
+    return (
+        parent is not None
+        and rel.back_populates == parent.key
+        and parent.back_populates == rel.key
+    )
+
+
+def _plan(model, dto, parent=None):
+    relationships = inspect(model).relationships
+    options = []
+    for name, field in dto.model_fields.items():
+        nested = _nested_dto(field.annotation)
+        if nested is None or name not in relationships:
+            continue
+        rel = relationships[name]
+        if not rel.uselist and _is_backref(rel, parent):
+            continue
+        attr = getattr(model, name)
+        loader = selectinload(attr) if rel.uselist else joinedload(attr)
+        children = _plan(rel.mapper.class_, nested, rel)
+        options.append(loader.options(*children) if children else loader)
+    return tuple(options)
+
+
+@lru_cache(maxsize=None)
+def load_options(model, dto):
+    # Uso: db.query(Subject).options(*load_options(Subject, SubjectDto))
+    return _plan(model, dto)
+
+
+# ----------------------
+# Proyecciones parciales (?fields= / ?expand=)
+# ----------------------
+# Sin parámetros se devuelve el DTO completo. Con alguno de los dos:
+#   - fields=id,name,teacher.name  -> columnas por nivel (ruta con puntos)
+#   - expand=teacher,evaluations.grades -> relaciones a incluir
+# Un nivel sin campos listados lleva todas sus columnas; las relaciones no
+# expandidas no se cargan ni se serializan (raiseload lo garantiza). La PK y
+# las claves foráneas se cargan siempre porque los permisos las consultan.
+
+
+class Shape:
+    def __init__(self, model, dto, columns, children):
+        self.model = model
+        self.dto = dto
+        self.columns = columns  # nombres de campos escalares del DTO, en su orden
+        self.children = children  # ((relación, Shape), ...)
+
+    @property
+    def key(self):
+        # Forma hashable para compilar un serializador por proyección
+        return (self.columns, tuple((name, child.key) for name, child in self.children))
+
+    def options(self):
+        mapper = inspect(self.model)
+        loaded = {key for key, attr in mapper.column_attrs.items() if attr.columns[0].primary_key or attr.columns[0].foreign_keys}
+        loaded.update(name for name in self.columns if name in mapper.column_attrs)
+        options = [load_only(*(getattr(self.model, name) for name in sorted(loaded))), raiseload("*", sql_only=True)]
+        for name, child in self.children:
+            rel = mapper.relationships[name]
+            attr = getattr(self.model, name)
+            loader = selectinload(attr) if rel.uselist else joinedload(attr)
+            options.append(loader.options(*child.options()))
+        return tuple(options)
+
+
+def _split(dto, model):
+    relationships = inspect(model).relationships
+    scalars, relations = [], {}
+    for name, field in dto.model_fields.items():
+        nested = _nested_dto(field.annotation)
+        if nested is not None and name in relationships:
+            relations[name] = nested
+        else:
+            scalars.append(name)
+    return scalars, relations
+
+
+def _build(model, dto, fields, expand, path=""):
+    scalars, relations = _split(dto, model)
+    wanted = fields.get(path, set())
+    unknown = wanted - set(scalars) - set(relations)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Campo desconocido: {path}{sorted(unknown)[0]}")
+    # Pedir una relación en fields equivale a expandirla
+    expanded = {name for name in relations if name in wanted or f"{path}{name}" in expand}
+    # Si el nivel lista campos, solo esos; si no, todas las columnas
+    columns = tuple(name for name in scalars if name in wanted) if wanted else tuple(scalars)
+    children = tuple(
+        (name, _build(inspect(model).relationships[name].mapper.class_, relations[name], fields, expand, f"{path}{name}."))
+        for name in relations if name in expanded
+    )
+    return Shape(model, dto, columns, children)
+
+
+class FieldParams:
+    def __init__(
+        self,
+        fields: str | None = Query(None, description="Campos a incluir, p. ej. id,name,teacher.name"),
+        expand: str | None = Query(None, description="Relaciones a incluir, p. ej. teacher,evaluations.grades"),
+    ):
+        self.fields = fields
+        self.expand = expand
+
+    def resolve(self, model, dto):
+        # None = DTO completo (comportamiento por defecto)
+        if self.fields is None and self.expand is None:
+            return None
+        fields, expand = {}, set()
+        for item in filter(None, (part.strip() for part in (self.fields or "").split(","))):
+            path, _, name = item.rpartition(".")
+            fields.setdefault(f"{path}." if path else "", set()).add(name)
+            # Un campo anidado implica expandir toda la ruta
+            parts = path.split(".") if path else []
+            expand.update(".".join(parts[:i + 1]) for i in range(len(parts)))
+        for item in filter(None, (part.strip() for part in (self.expand or "").split(","))):
+            parts = item.split(".")
+            expand.update(".".join(parts[:i + 1]) for i in range(len(parts)))
+        unknown = _unknown_paths(model, dto, expand)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Relación desconocida: {unknown}")
+        return _build(model, dto, fields, expand)
+
+
+def _unknown_paths(model, dto, expand):
+    for path in sorted(expand):
+        current_model, current_dto = model, dto
+        for name in path.split("."):
+            _, relations = _split(current_dto, current_model)
+            if name not in relations:
+                return path
+            current_model = inspect(current_model).relationships[name].mapper.class_
+            current_dto = relations[name]
+    return None
+
+
+def query_options(model, dto, shape: Shape | None):
+    return load_options(model, dto) if shape is None else shape.options()
@@ -0,0 +1,93 @@
+import base64
+import json
+from datetime import datetime
+from typing import Literal
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import String, literal, tuple_
+
+# ----------------------
+# Paginación por cursor (keyset)
+# ----------------------
+# En lugar de OFFSET se continúa desde la última fila vista, ordenando por
+# `id` o por (`updated_at`, `id`). El cuerpo sigue siendo una lista; el cursor
+# de la siguiente página viaja en el header X-Next-Cursor (ausente si no hay más).
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class PageParams:
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+        cursor: str | None = None,
+        order_by: Literal["id", "updated_at"] = "id",
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.order_by = order_by
+
+
+class DateRange:
+    def __init__(self, date_from: datetime | None = None, date_to: datetime | None = None):
+        self.date_from = date_from
+        self.date_to = date_to
+
+    def apply(self, query, column):
+        if self.date_from is not None:
+            query = query.filter(column >= self.date_from)
+        if self.date_to is not None:
+            query = query.filter(column <= self.date_to)
+        return query
+
+
+def _encode_cursor(order_by, row):
+    value = getattr(row, order_by)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps({"o": order_by, "k": [value, row.id]}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(order_by, cursor):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        value, last_id = data["k"]
+        if data["o"] != order_by:
+            raise ValueError(order_by)
+        if order_by == "updated_at":
+            value = datetime.fromisoformat(value)
+        return value, int(last_id)
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def _stored_value(query, value):
+    # SQLite guarda CURRENT_TIMESTAMP como texto 'YYYY-MM-DD HH:MM:SS' y compara
+    # como texto: el valor del cursor va en ese mismo formato (fracción solo si la
+    # tiene); con '.000000' las filas del mismo segundo quedarían por debajo
+    if isinstance(value, datetime) and query.session.get_bind().dialect.name == "sqlite":
+        return literal(value.isoformat(sep=" "), String)
+    return value
+
+
+def paginate(query, model, page: PageParams, response: Response):
+    if page.order_by == "id":
+        keys = (model.id,)
+    else:
+        keys = (getattr(model, page.order_by), model.id)
+
+    if page.cursor:
+        value, last_id = _decode_cursor(page.order_by, page.cursor)
+        if len(keys) == 1:
+            query = query.filter(model.id > last_id)
+        else:
+            query = query.filter(tuple_(*keys) > tuple_(_stored_value(query, value), last_id))
+
+    rows = query.order_by(*keys).limit(page.limit + 1).all()
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        response.headers[NEXT_CURSOR_HEADER] = _encode_cursor(page.order_by, rows[-1])
+    return rows
@@ -0,0 +1,85 @@
+from fastapi import APIRouter, Depends, File, HTTPException, Path, Request, Response, UploadFile
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from blobs import THUMBNAIL_SIZES, InvalidPhoto, photo_store
+from config import settings
+from database import get_db
+from models.user import User, UserRole
+from routes.dtos import PhotoDto
+
+from .users import forget_principal, get_current_user  # autenticación
+
+
+router = APIRouter(tags=["photos"])
+
+# El contenido detrás de un hash no cambia: se cachea un año sin revalidar
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+
+def photo_dto(digest: str):
+    return PhotoDto(
+        photo=digest,
+        url=f"/photos/{digest}",
+        thumbnails={size: f"/photos/{digest}?size={size}" for size in THUMBNAIL_SIZES},
+    )
+
+
+def _editable_user(user_id, db, curr_user):
+    if curr_user.role != UserRole.ADMIN and curr_user.id != user_id:
+        raise HTTPException(status_code=403, detail="No tienes permiso para cambiar la foto de este usuario")
+    user = db.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    return user
+
+
+@router.put("/users/{user_id}/photo", response_model=PhotoDto)
+def upload_photo(
+    user_id: int,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    curr_user: User = Depends(get_current_user),
+):
+    user = _editable_user(user_id, db, curr_user)
+    data = file.file.read(settings.PHOTO_MAX_BYTES + 1)
+    if len(data) > settings.PHOTO_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"La foto supera el máximo de {settings.PHOTO_MAX_BYTES} bytes")
+    try:
+        digest = photo_store.put_photo(data)
+    except InvalidPhoto as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    user.photo = digest
+    db.commit()
+    forget_principal(user.email)
+    return photo_dto(digest)
+
+
+@router.delete("/users/{user_id}/photo", status_code=204)
+def delete_photo(user_id: int, db: Session = Depends(get_db), curr_user: User = Depends(get_current_user)):
+    # Solo se desvincula: el archivo puede estar compartido por otros usuarios con la misma foto
+    user = _editable_user(user_id, db, curr_user)
+    user.photo = None
+    db.commit()
+    forget_principal(user.email)
+    return Response(status_code=204)
+
+
+@router.get("/photos/{digest}")
+def get_photo(
+    request: Request,
+    digest: str = Path(pattern=r"^[0-9a-f]{64}$"),
+    size: int | None = None,
+):
+    # Sin autenticación: el hash sha256 no se puede adivinar y así la foto sirve en un <img>
+    if size is not None and size not in THUMBNAIL_SIZES:
+        raise HTTPException(status_code=400, detail=f"Tamaño de miniatura inválido; opciones: {list(THUMBNAIL_SIZES)}")
+    if not photo_store.exists(digest):
+        raise HTTPException(status_code=404, detail="Foto no encontrada")
+
+    etag = f'"{digest}-{size}"' if size else f'"{digest}"'
+    headers = {"Cache-Control": IMMUTABLE_CACHE, "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    path, media_type = photo_store.open(digest, size)
+    return FileResponse(path, media_type=media_type, headers=headers)
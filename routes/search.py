@@ -0,0 +1,48 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from database import get_db
+from models.subject import Subject
+from models.user import User, UserRole
+from routes.dtos import SearchResultDto
+
+from .authz import AccessScope, get_access_scope
+from .fulltext import subjects_index, users_index
+from .users import get_current_user  # autenticación
+
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+@router.get("/", response_model=SearchResultDto)
+def search(
+    q: str = Query(min_length=1, max_length=100),
+    type: Literal["all", "users", "subjects"] = "all",
+    role: UserRole | None = None,
+    active: bool | None = None,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    db: Session = Depends(get_db),
+    curr_user: User = Depends(get_current_user),
+    scope: AccessScope = Depends(get_access_scope),
+):
+    # Usuarios por nombre, email o identificación (solo administradores y profesores);
+    # materias por nombre o descripción, con la misma visibilidad que /subjects
+    result = {"users": [], "subjects": []}
+    if type in ("all", "users"):
+        if curr_user.role == UserRole.STUDENT:
+            if type == "users":
+                raise HTTPException(status_code=403, detail="No tienes permiso para buscar usuarios")
+        else:
+            criteria = []
+            if role is not None:
+                criteria.append(User.role == role)
+            if active is not None:
+                criteria.append(User.active == active)
+            result["users"] = users_index.ranked(db, q, limit, *criteria)
+    if type in ("all", "subjects"):
+        result["subjects"] = subjects_index.ranked(db, q, limit, *scope.restrict(Subject.id))
+    return result
@@ -0,0 +1,175 @@
+import enum
+import json
+from datetime import date, datetime
+from functools import lru_cache
+from types import UnionType
+from typing import Union, get_args, get_origin
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+# ----------------------
+# Serialización directa de filas ORM
+# ----------------------
+# Las filas que salen de la base ya son confiables; validarlas otra vez con
+# `from_attributes` para cada DTO anidado es lo que más CPU consume en los
+# listados. Aquí se genera, una vez por DTO, una función que arma el dict
+# leyendo los atributos ORM en el orden de los campos del DTO, y el resultado
+# se codifica directo a bytes. El endpoint conserva `response_model`, así que
+# el esquema OpenAPI no cambia; devolver un Response evita la revalidación.
+#
+# Solo se copian tal cual los tipos en los que pydantic no transforma nada
+# (PASS_THROUGH); float y los Enum se convierten aquí, y cualquier otro tipo
+# (EmailStr, dict, Any...) pasa por un TypeAdapter del campo, de modo que el
+# JSON es el mismo que daría response_model.
+#
+# Las proyecciones (?fields=/?expand=) las elige el cliente: sus funciones van
+# en una caché LRU aparte, para que no desplacen a las del DTO completo.
+
+PASS_THROUGH = (int, str, bool, datetime, date)
+FULL_CACHE_SIZE = 128
+SHAPE_CACHE_SIZE = 512
+
+
+def _dto_of(annotation):
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    return None
+
+
+def _is_optional(annotation):
+    return get_origin(annotation) in (Union, UnionType) and type(None) in get_args(annotation)
+
+
+def _converter(annotation, shape=None):
+    # Función que convierte un valor según la anotación, o None si va tal cual
+    if _is_optional(annotation):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) != 1:
+            return _validated(annotation)
+        convert = _converter(args[0], shape)
+        if convert is None:
+            return None
+        return lambda value: None if value is None else convert(value)
+    if get_origin(annotation) in (list, tuple, set):
+        args = get_args(annotation)
+        if not args:
+            return _validated(annotation)
+        convert = _converter(args[0], shape)
+        if convert is None:
+            return None
+        return lambda rows: [convert(row) for row in rows]
+    dto = _dto_of(annotation)
+    if dto is not None:
+        return _compile(dto, shape)
+    if annotation in PASS_THROUGH:
+        return None
+    if annotation is float:
+        # Columnas Integer declaradas float en el DTO (p. ej. percentage)
+        return float
+    if isinstance(annotation, type) and issubclass(annotation, enum.Enum):
+        # La columna puede traer el valor crudo en vez del miembro
+        return lambda value: annotation(value).value
+    return _validated(annotation)
+
+
+def _validated(annotation):
+    # Tipos con validación propia (p. ej. EmailStr normaliza el dominio): se delega en pydantic
+    adapter = TypeAdapter(annotation)
+    return lambda value: adapter.dump_python(adapter.validate_python(value), mode="json")
+
+
+def _compile(dto, shape=None):
+    return _compile_full(dto) if shape is None else _compile_shape(dto, shape)
+
+
+@lru_cache(maxsize=FULL_CACHE_SIZE)
+def _compile_full(dto):
+    return _generate(dto, None)
+
+
+@lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def _compile_shape(dto, shape):
+    return _generate(dto, shape)
+
+
+def _generate(dto, shape):
+    # Genera p. ej.: def serialize_GradeDto(o): return {'id': o.id, ..., 'student': _student(o.student)}
+    # `shape` es Shape.key de routes/loading.py: (columnas, ((relación, shape), ...)); None = DTO completo
+    if shape is not None:
+        columns, children = set(shape[0]), dict(shape[1])
+    namespace = {}
+    items = []
+    for name, field in dto.model_fields.items():
+        if shape is not None and name not in columns and name not in children:
+            continue
+        convert = _converter(field.annotation, children.get(name) if shape is not None else None)
+        if convert is None:
+            items.append(f"{name!r}: o.{name}")
+        else:
+            namespace[f"_{name}"] = convert
+            items.append(f"{name!r}: _{name}(o.{name})")
+    source = f"def serialize_{dto.__name__}(o):\n    return {{{', '.join(items)}}}\n"
+    exec(source, namespace)
+    return namespace[f"serialize_{dto.__name__}"]
+
+
+def serializer(response_model, shape=None):
+    # Acepta `SubjectDto` o `list[SubjectDto]`, igual que response_model
+    return _serializer_full(response_model) if shape is None else _serializer_shape(response_model, shape)
+
+
+@lru_cache(maxsize=FULL_CACHE_SIZE)
+def _serializer_full(response_model):
+    return _build_serializer(response_model, None)
+
+
+@lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def _serializer_shape(response_model, shape):
+    return _build_serializer(response_model, shape)
+
+
+def _build_serializer(response_model, shape):
+    if get_origin(response_model) in (list, tuple, set):
+        item = _compile(get_args(response_model)[0], shape)
+        return lambda rows: [item(row) for row in rows]
+    return _compile(response_model, shape)
+
+
+def _default(value):
+    if isinstance(value, datetime) and value.utcoffset() is not None and not value.utcoffset():
+        return value.replace(tzinfo=None).isoformat() + "Z"  # igual que pydantic
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+@lru_cache(maxsize=1)
+def load_orjson():
+    # orjson se importa al primer uso; es opcional: sin él se usa json estándar, solo más lento
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+def dumps(content) -> bytes:
+    orjson = load_orjson()
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def json_response(response_model, content, response: Response | None = None, body: bytes | None = None, shape=None):
+    # `response` es el Response inyectado en el endpoint: sus headers (X-Next-Cursor, ETag...) se conservan
+    if body is None:
+        body = dumps(serializer(response_model, shape.key if shape is not None else None)(content))
+    reply = Response(body, media_type="application/json")
+    if response is not None:
+        for name, value in response.headers.items():
+            if name not in ("content-length", "content-type"):
+                reply.headers.setdefault(name, value)
+    return reply
@@ -1,23 +1,71 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import func, select, true
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from database import get_db
+from models.enrollment import Enrollment
+from models.evaluation import Evaluation
+from models.final_grade import FinalGrade
+from models.grade import Grade
 from models.subject import Subject
 from models.user import User, UserRole
-from routes.dtos import CreateSubjectDto, SubjectDto, UpdateSubjectDto
+from routes.dtos import (
+    CreateSubjectDto,
+    GradebookDto,
+    GradebookEvaluationDto,
+    GradebookStudentDto,
+    SubjectDto,
+    UpdateSubjectDto,
+)
+from .authz import AccessScope, get_access_scope
+from .caching import USER_ROWS, cached_response, subject_tag
+from .conditional import conditional_get, probe
+from .loading import FieldParams, query_options
+from .pagination import DateRange, PageParams, paginate
+from .serialization import json_response
 from .users import get_current_user  # Reutilizamos la función de autenticación
 
 
 router = APIRouter(prefix="/subjects", tags=["subjects"])
 
 
+def _subject_tree_probes(subject_ids):
+    # Todo lo que SubjectDto serializa: materia, profesor, matrículas, evaluaciones y sus notas
+    return [
+        probe(Subject, Subject.id.in_(subject_ids)),
+        probe(User, User.id.in_(select(Subject.teacher_id).where(Subject.id.in_(subject_ids)))),
+        probe(Enrollment, Enrollment.subject_id.in_(subject_ids)),
+        probe(Evaluation, Evaluation.subject_id.in_(subject_ids)),
+        probe(Grade, Grade.evaluation_id.in_(select(Evaluation.id).where(Evaluation.subject_id.in_(subject_ids)))),
+    ]
+
+
 @router.get("/", response_model=list[SubjectDto])
-def list_subjects(db: Session = Depends(get_db), curr_user: User = Depends(get_current_user)):
-    if curr_user.role == UserRole.TEACHER:
-        return db.query(Subject).filter(Subject.teacher_id == curr_user.id).all()
-    if curr_user.role == UserRole.STUDENT:
-        return db.query(Subject).join(Subject.enrollments).filter_by(student_id=curr_user.id).all()
-    return db.query(Subject).all()
+def list_subjects(
+    request: Request,
+    response: Response,
+    teacher_id: int | None = None,
+    page: PageParams = Depends(),
+    dates: DateRange = Depends(),
+    sparse: FieldParams = Depends(),
+    db: Session = Depends(get_db),
+    curr_user: User = Depends(get_current_user),
+    scope: AccessScope = Depends(get_access_scope)
+):
+    # El profesor ve las suyas y el estudiante aquellas en las que está matriculado
+    shape = sparse.resolve(Subject, SubjectDto)
+    criteria = scope.restrict(Subject.id)
+    if teacher_id is not None:
+        criteria.append(Subject.teacher_id == teacher_id)
+
+    subject_ids = dates.apply(select(Subject.id).where(*criteria), Subject.created_at)
+    conditional_get(request, response, db, _subject_tree_probes(subject_ids), scope=curr_user.id)
+
+    query = db.query(Subject).options(*query_options(Subject, SubjectDto, shape)).filter(*criteria)
+    query = dates.apply(query, Subject.created_at)
+    return json_response(list[SubjectDto], paginate(query, Subject, page, response), response, shape=shape)
 
 
 @router.post("/", response_model=SubjectDto)
@@ -45,20 +93,79 @@ def create_subject(
 
 
 @router.get("/{subject_id}", response_model=SubjectDto)
-def get_subject(subject_id: int, db: Session = Depends(get_db), curr_user: User = Depends(get_current_user)):
-    subject = db.query(Subject).filter(Subject.id == subject_id).first()
-    if not subject:
-        raise HTTPException(status_code=404, detail="Asignatura no encontrada")
-    if curr_user.role == UserRole.TEACHER and curr_user.id != subject.teacher_id:
-        raise HTTPException(status_code=403, detail="No tienes permiso para ver esta asignatura")
-    if curr_user.role == UserRole.STUDENT:
-        enrollment = db.query(Subject).join(Subject.enrollments).filter(
-            Subject.id == subject_id,
-            Subject.enrollments.any(student_id=curr_user.id)
-        ).first()
-        if not enrollment:
-            raise HTTPException(status_code=403, detail="No tienes permiso para ver esta asignatura")
-    return subject
+def get_subject(
+    subject_id: int,
+    request: Request,
+    response: Response,
+    sparse: FieldParams = Depends(),
+    db: Session = Depends(get_db),
+    scope: AccessScope = Depends(get_access_scope)
+):
+    scope.require(db, subject_id, "No tienes permiso para ver esta asignatura", not_found="Asignatura no encontrada")
+    # Verificado el permiso, el contenido es el mismo para cualquier usuario autorizado
+    shape = sparse.resolve(Subject, SubjectDto)
+    return cached_response(
+        request, response, SubjectDto, "subject", [subject_tag(subject_id), USER_ROWS],
+        lambda: db.query(Subject).options(*query_options(Subject, SubjectDto, shape)).filter(Subject.id == subject_id).one(),
+        shape=shape,
+    )
+
+
+@router.get("/{subject_id}/gradebook", response_model=GradebookDto)
+def get_gradebook(subject_id: int, db: Session = Depends(get_db), scope: AccessScope = Depends(get_access_scope)):
+    scope.require(
+        db, subject_id, "No tienes permiso para ver el libro de notas de esta asignatura",
+        manage=True, not_found="Asignatura no encontrada",
+    )
+
+    # Una sola consulta: la lista de evaluaciones (CTE) y una fila por estudiante
+    # matriculado con su nota definitiva y sus notas agregadas en JSON
+    evaluations = select(Evaluation.id, Evaluation.name, Evaluation.percentage).where(
+        Evaluation.subject_id == subject_id
+    ).cte("subject_evaluations")
+    header = select(
+        func.json_group_array(func.json_array(evaluations.c.id, evaluations.c.name, evaluations.c.percentage)).label("evaluations")
+    ).cte("gradebook_header")
+    subject_grades = select(Grade.student_id, Grade.evaluation_id, Grade.score).join(
+        evaluations, evaluations.c.id == Grade.evaluation_id
+    ).cte("subject_grades")
+    students = select(
+        User.id, User.name, User.idnumber, Enrollment.active, FinalGrade.weighted_average,
+        func.json_group_array(func.json_array(subject_grades.c.evaluation_id, subject_grades.c.score)).filter(
+            subject_grades.c.evaluation_id.is_not(None)
+        ).label("scores"),
+    ).select_from(Enrollment).join(User, User.id == Enrollment.student_id).outerjoin(
+        FinalGrade, (FinalGrade.student_id == User.id) & (FinalGrade.subject_id == subject_id)
+    ).outerjoin(
+        subject_grades, subject_grades.c.student_id == User.id
+    ).where(Enrollment.subject_id == subject_id).group_by(Enrollment.id).subquery()
+    rows = db.execute(
+        select(header.c.evaluations, students).select_from(header).outerjoin(students, true()).order_by(
+            students.c.name, students.c.id
+        )
+    ).all()
+
+    # El encabezado viene repetido en cada fila; sin matriculados llega una sola fila sin estudiante
+    evaluations = [
+        GradebookEvaluationDto(id=id, name=name, percentage=percentage)
+        for id, name, percentage in sorted(json.loads(rows[0].evaluations))
+    ]
+    column_of = {evaluation.id: j for j, evaluation in enumerate(evaluations)}
+    students = [row for row in rows if row.id is not None]
+    scores = [[None] * len(evaluations) for _ in students]
+    for i, student in enumerate(students):
+        for evaluation_id, score in json.loads(student.scores):
+            scores[i][column_of[evaluation_id]] = score
+
+    return GradebookDto(
+        subject_id=subject_id,
+        students=[
+            GradebookStudentDto(id=s.id, name=s.name, idnumber=s.idnumber, active=bool(s.active)) for s in students
+        ],
+        evaluations=evaluations,
+        scores=scores,
+        final_grades=[s.weighted_average for s in students],
+    )
 
 
 @router.put("/{subject_id}", response_model=SubjectDto)
@@ -66,15 +173,14 @@ def update_subject(
     subject_id: int,
     subject_data: UpdateSubjectDto,
     db: Session = Depends(get_db),
-    curr_user: User = Depends(get_current_user)
+    scope: AccessScope = Depends(get_access_scope)
 ):
+    if not scope.can_manage(subject_id):
+        raise HTTPException(status_code=403, detail="No tienes permiso para modificar esta asignatura")
     subject = db.query(Subject).filter(Subject.id == subject_id).first()
     if not subject:
         raise HTTPException(status_code=404, detail="Asignatura no encontrada")
 
-    if curr_user.role != UserRole.ADMIN and curr_user.id != subject.teacher_id:
-        raise HTTPException(status_code=403, detail="No tienes permiso para modificar esta asignatura")
-
     if subject_data.name is not None:
         subject.name = subject_data.name
     if subject_data.description is not None:
@@ -1,22 +1,44 @@
 from datetime import datetime, timedelta, timezone
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from pydantic import ValidationError
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from database import get_db
+from database import AsyncSessionLocal, get_async_db, get_async_read_db, get_db
+from models.enrollment import Enrollment
 from models.user import User, UserRole
-from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
+from starlette.concurrency import run_in_threadpool
+from access_log import annotate, log_event
+from blobs import InvalidPhoto, store_photo_value
+from cache import TTLCache
 from config import settings
-from routes.dtos import CreateUserDto, LoginDto, TokenDto, UpdateUserDto, UserDto
+from routes.bulk import CSV_REQUEST_BODY, batches, read_csv_records
+from routes.caching import USER_LISTS, USER_ROWS, cached_response, mark_changed
+from routes.dtos import (
+    BulkCreatedUserDto,
+    BulkRejectedRowDto,
+    BulkUserResultDto,
+    CreateUserDto,
+    LoginDto,
+    TokenDto,
+    UpdateUserDto,
+    UserDto,
+)
+from routes.fulltext import users_index
+from routes.loading import FieldParams, load_options, query_options
+from routes.pagination import DateRange, PageParams, paginate
+from routes.serialization import json_response
+from security import hash_password, hash_passwords, password_hasher, verify_password
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# Usuarios autenticados recientes, por `sub` del token. Se guardan desasociados
+# de la sesión (solo columnas); invalidar con `forget_principal` al modificarlos.
+principal_cache = TTLCache(settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL_SECONDS)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+def forget_principal(email: str):
+    principal_cache.invalidate(email)
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
@@ -25,15 +47,19 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
+    from jose import jwt  # import diferido: python-jose pesa en el arranque
+
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_read_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         email: str = payload.get("sub")
@@ -42,56 +68,199 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
+    user = principal_cache.get(email)
+    if user is not None:
+        annotate(user_id=user.id)
+        return user
+
+    user = (await db.execute(select(User).where(User.email == email))).scalars().first()
     if user is None:
         raise credentials_exception
+    db.expunge(user)
+    principal_cache.set(email, user)
+    annotate(user_id=user.id)
     return user
 
 
+async def photo_value(value: str | None):
+    # Las fotos en base64 pasan al almacén de blobs (CPU de miniaturas fuera del event loop)
+    try:
+        return await run_in_threadpool(store_photo_value, value)
+    except InvalidPhoto as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def load_user_dto(db: AsyncSession, user_id: int):
+    # En sesiones async no hay lazy load: se cargan las relaciones de UserDto de una vez
+    stmt = (
+        select(User)
+        .options(*load_options(User, UserDto))
+        .where(User.id == user_id)
+        .execution_options(populate_existing=True)
+    )
+    return (await db.execute(stmt)).scalars().first()
+
+
+async def _bulk_import_users(db: AsyncSession, records: list[tuple[int, dict]]):
+    result = BulkUserResultDto()
+
+    # 1. Validación por fila y duplicados dentro de la propia importación
+    accepted, emails, idnumbers = [], set(), set()
+    for row, data in records:
+        try:
+            user_data = CreateUserDto.model_validate(data)
+        except ValidationError as e:
+            error = e.errors()[0]
+            detail = f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}"
+            result.rejected.append(BulkRejectedRowDto(row=row, reference=data.get("email"), detail=detail))
+            continue
+        if user_data.email in emails or user_data.idnumber in idnumbers:
+            result.rejected.append(BulkRejectedRowDto(
+                row=row, reference=user_data.email, detail="Email o número de identificación repetido en la importación"
+            ))
+            continue
+        emails.add(user_data.email)
+        idnumbers.add(user_data.idnumber)
+        accepted.append((row, user_data))
+
+    # 2. Unicidad contra la base de datos con consultas por conjuntos
+    taken_emails, taken_idnumbers = set(), set()
+    for batch in batches(accepted):
+        stmt = select(User.email, User.idnumber).where(or_(
+            User.email.in_([user_data.email for _, user_data in batch]),
+            User.idnumber.in_([user_data.idnumber for _, user_data in batch]),
+        ))
+        for email, idnumber in await db.execute(stmt):
+            taken_emails.add(email)
+            taken_idnumbers.add(idnumber)
+
+    pending = []
+    for row, user_data in accepted:
+        if user_data.email in taken_emails:
+            result.rejected.append(BulkRejectedRowDto(row=row, reference=user_data.email, detail="Email ya registrado"))
+        elif user_data.idnumber in taken_idnumbers:
+            result.rejected.append(BulkRejectedRowDto(
+                row=row, reference=user_data.email, detail="Número de identificación ya registrado"
+            ))
+        else:
+            try:
+                user_data.photo = await run_in_threadpool(store_photo_value, user_data.photo)
+            except InvalidPhoto as e:
+                result.rejected.append(BulkRejectedRowDto(row=row, reference=user_data.email, detail=f"photo: {e}"))
+                continue
+            pending.append((row, user_data))
+
+    # 3. Hash en paralelo e inserción por lotes en una sola transacción; mientras
+    # se calculan los hashes se suelta la única conexión del escritor
+    await db.rollback()
+    hashed = await hash_passwords([user_data.password for _, user_data in pending])
+    values = [
+        {
+            "name": user_data.name,
+            "email": user_data.email,
+            "idnumber": user_data.idnumber,
+            "password": password,
+            "role": user_data.role,
+            "age": user_data.age,
+            "photo": user_data.photo,
+            "active": user_data.active,
+        }
+        for (_, user_data), password in zip(pending, hashed)
+    ]
+    rows_by_email = {user_data.email: row for row, user_data in pending}
+    try:
+        for batch in batches(values):
+            for user_id, email in await db.execute(insert(User).returning(User.id, User.email), batch):
+                result.created.append(BulkCreatedUserDto(row=rows_by_email[email], id=user_id, email=email))
+        mark_changed(db, USER_ROWS, USER_LISTS)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        log_event("error", "users_bulk_import_failed", error=str(e))
+        raise HTTPException(status_code=500, detail=f"Error al importar usuarios: {str(e)}")
+
+    for created in result.created:
+        forget_principal(created.email)
+    result.created.sort(key=lambda created: created.row)
+    result.rejected.sort(key=lambda rejected: rejected.row)
+    return result
+
+
 router = APIRouter(prefix="/users", tags=["users"])
 
-@router.get("/")
-def list_users(db: Session = Depends(get_db)):
-    return db.query(User).all()
+@router.get("/", response_model=list[UserDto])
+def list_users(
+    response: Response,
+    role: UserRole | None = None,
+    active: bool | None = None,
+    page: PageParams = Depends(),
+    dates: DateRange = Depends(),
+    sparse: FieldParams = Depends(),
+    db: Session = Depends(get_db),
+):
+    shape = sparse.resolve(User, UserDto)
+    query = db.query(User).options(*query_options(User, UserDto, shape))
+    if role is not None:
+        query = query.filter(User.role == role)
+    if active is not None:
+        query = query.filter(User.active == active)
+    query = dates.apply(query, User.created_at)
+    return json_response(list[UserDto], paginate(query, User, page, response), response, shape=shape)
 
 @router.post("/login", response_model=TokenDto)
-async def login(login_data: LoginDto, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == login_data.username).first()
-    if not user or not verify_password(login_data.password, user.password):
-        print("Invalid credentials")
+async def login(login_data: LoginDto, db: AsyncSession = Depends(get_async_read_db)):
+    # La verificación (bcrypt) usa el pool de lectura; solo el rehash pasa por el escritor
+    user = (await db.execute(select(User).where(User.email == login_data.username))).scalars().first()
+    valid, new_hash = (False, None)
+    if user:
+        valid, new_hash = await verify_password(login_data.password, user.password)
+    if not valid:
+        log_event("warning", "login_failed", reason="invalid_credentials")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email o contraseña incorrectos",
         )
     
     if not user.active:
-        print("Inactive account")
+        log_event("warning", "login_failed", reason="inactive_account", user_id=user.id)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Cuenta no activada",
         )
     
-    access_token = create_access_token(data={"sub": user.email})
+    user_id, email = user.id, user.email
+    if new_hash:
+        # El costo de bcrypt cambió: se actualiza el hash de forma transparente
+        async with AsyncSessionLocal() as writer:
+            try:
+                await writer.execute(update(User).where(User.id == user_id).values(password=new_hash))
+                await writer.commit()
+            except Exception as e:
+                await writer.rollback()
+                log_event("error", "password_rehash_failed", user_id=user_id, error=str(e))
+
+    access_token = create_access_token(data={"sub": email})
     return {
         "access_token": access_token,
         "token_type": "bearer",
-        "user": user 
+        "user": await load_user_dto(db, user_id)
     }
 
 @router.post("/register", response_model=UserDto)
-async def register(user_data: CreateUserDto, db: Session = Depends(get_db), curr_user: User = Depends(get_current_user)):
+async def register(user_data: CreateUserDto, db: AsyncSession = Depends(get_async_db), curr_user: User = Depends(get_current_user)):
     if curr_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="No tienes permiso para registrar usuarios")
     
-    if db.query(User).filter(User.email == user_data.email).first():
+    if (await db.execute(select(User.id).where(User.email == user_data.email))).first():
         raise HTTPException(status_code=400, detail="Email ya registrado")
     
-    if db.query(User).filter(User.idnumber == user_data.idnumber).first():
+    if (await db.execute(select(User.id).where(User.idnumber == user_data.idnumber))).first():
         raise HTTPException(status_code=400, detail="Número de identificación ya registrado")
     
-    hashed_password = get_password_hash(user_data.password)
-    if user_data.photo != None and user_data.photo.strip() == "":
-        user_data.photo = None
+    # Se suelta la única conexión del escritor mientras corren bcrypt y las miniaturas
+    await db.rollback()
+    hashed_password = await hash_password(user_data.password)
+    user_data.photo = await photo_value(user_data.photo)
     db_user = User(
         name=user_data.name,
         email=user_data.email,
@@ -103,95 +272,186 @@ async def register(user_data: CreateUserDto, db: Session = Depends(get_db), curr
         active=user_data.active,
     )
     try:
-        print("Adding user to database")
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
     except Exception as e:
-        db.rollback()
-        print(e)
+        await db.rollback()
+        log_event("error", "user_register_failed", error=str(e))
         raise HTTPException(status_code=500, detail=f"Error al registrar usuario: {str(e)}")
-    return db_user
+    forget_principal(db_user.email)
+    log_event("info", "user_created", user_id=db_user.id, role=db_user.role.value, by=curr_user.id)
+    return await load_user_dto(db, db_user.id)
+
+@router.post("/bulk", response_model=BulkUserResultDto)
+async def bulk_register(users_data: list[dict], db: AsyncSession = Depends(get_async_db), curr_user: User = Depends(get_current_user)):
+    if curr_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="No tienes permiso para registrar usuarios")
+    # Se valida fila a fila para devolver el error de cada una sin rechazar todo el lote
+    return await _bulk_import_users(db, list(enumerate(users_data, start=1)))
+
+@router.post("/bulk/csv", response_model=BulkUserResultDto, openapi_extra=CSV_REQUEST_BODY)
+async def bulk_register_csv(request: Request, db: AsyncSession = Depends(get_async_db), curr_user: User = Depends(get_current_user)):
+    if curr_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="No tienes permiso para registrar usuarios")
+    records = await read_csv_records(request, required_any=("email",))
+    # Las columnas vacías toman el valor por defecto de CreateUserDto
+    return await _bulk_import_users(db, [
+        (row, {column: value for column, value in record.items() if value != ""}) for row, record in records
+    ])
 
 @router.get("/me", response_model=UserDto)
-async def read_users_me(current_user: User = Depends(get_current_user)):
-    return current_user
+async def read_users_me(db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    # current_user puede venir de la caché sin relaciones cargadas
+    return await load_user_dto(db, current_user.id)
+
+@router.get("/auth-stats")
+def auth_stats(curr_user: User = Depends(get_current_user)):
+    if curr_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="No tienes permiso para ver estas estadísticas")
+    return {
+        "principal_cache": principal_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+    }
 
 @router.put("/me", response_model=UserDto)
-async def update_user(user_data: UpdateUserDto, db: Session = Depends(get_db), curr_user: User = Depends(get_current_user)):
-    user = db.query(User).filter(User.id == curr_user.id).first()
+async def update_user(user_data: UpdateUserDto, db: AsyncSession = Depends(get_async_db), curr_user: User = Depends(get_current_user)):
+    user_id = curr_user.id
+    # bcrypt y las miniaturas antes de tomar la única conexión del escritor
+    password = await hash_password(user_data.password) if user_data.password is not None else None
+    photo = await photo_value(user_data.photo) if user_data.photo is not None else None
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
-    if curr_user.role != UserRole.ADMIN and curr_user.id != user.id:
-        raise HTTPException(status_code=403, detail="No tienes permiso para actualizar este usuario")
     
     if user_data.name is not None:
         user.name = user_data.name
     if user_data.age is not None:
         user.age = user_data.age
-    if user_data.password is not None:
-        user.password = get_password_hash(user_data.password)
+    if password is not None:
+        user.password = password
     if user_data.photo is not None:
-        user.photo = user_data.photo
+        user.photo = photo
     if user_data.active is not None:
         user.active = user_data.active
     
     try:
-        db.commit()
-        db.refresh(user)
+        await db.commit()
     except Exception as e:
-        db.rollback()
-        print(e)
+        await db.rollback()
+        log_event("error", "user_update_failed", user_id=user_id, error=str(e))
         raise HTTPException(status_code=500, detail=f"Error al actualizar usuario: {str(e)}")
-    return user
+    forget_principal(user.email)
+    return await load_user_dto(db, user.id)
 
 @router.get("/unenrolled-students/{subject_id}", response_model=list[UserDto])
-def list_unenrolled_students(subject_id: int, db: Session = Depends(get_db), curr_user: User = Depends(get_current_user)):
+def list_unenrolled_students(
+    subject_id: int,
+    response: Response,
+    q: str | None = Query(None, max_length=100),
+    active: bool | None = None,
+    page: PageParams = Depends(),
+    sparse: FieldParams = Depends(),
+    db: Session = Depends(get_db),
+    curr_user: User = Depends(get_current_user),
+):
     if curr_user.role != UserRole.ADMIN and curr_user.role != UserRole.TEACHER:
         raise HTTPException(status_code=403, detail="No tienes permiso para ver los estudiantes no inscritos")
-    
-    subquery = db.query(User.id).join(User.enrollments).filter_by(subject_id=subject_id).subquery()
-    unenrolled_students = db.query(User).filter(User.role == UserRole.STUDENT, ~User.id.in_(subquery)).all()
-    return unenrolled_students
+
+    # Anti-join: NOT EXISTS sobre el índice único (student_id, subject_id), paginado y opcionalmente filtrado por búsqueda
+    shape = sparse.resolve(User, UserDto)
+    enrolled = select(Enrollment.id).where(Enrollment.student_id == User.id, Enrollment.subject_id == subject_id)
+    query = db.query(User).options(*query_options(User, UserDto, shape)).filter(User.role == UserRole.STUDENT, ~enrolled.exists())
+    if active is not None:
+        query = query.filter(User.active == active)
+    if q:
+        query = query.filter(users_index.filter(db, q))
+    return json_response(list[UserDto], paginate(query, User, page, response), response, shape=shape)
 
 @router.put("/{user_id}", response_model=UserDto)
-async def update_user(user_id: int, user_data: UpdateUserDto, db: Session = Depends(get_db), curr_user: User = Depends(get_current_user)):
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+async def update_user(user_id: int, user_data: UpdateUserDto, db: AsyncSession = Depends(get_async_db), curr_user: User = Depends(get_current_user)):
     if curr_user.role != UserRole.ADMIN and curr_user.id != user_id:
         raise HTTPException(status_code=403, detail="No tienes permiso para actualizar este usuario")
+    # bcrypt y las miniaturas antes de tomar la única conexión del escritor
+    password = await hash_password(user_data.password) if user_data.password is not None else None
+    photo = await photo_value(user_data.photo) if user_data.photo is not None else None
+    user = await db.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
     if user_data.name is not None:
         user.name = user_data.name
     if user_data.age is not None:
         user.age = user_data.age
-    if user_data.password is not None:
-        user.password = get_password_hash(user_data.password)
+    if password is not None:
+        user.password = password
     if user_data.photo is not None:
-        user.photo = user_data.photo
+        user.photo = photo
     if user_data.active is not None:
         user.active = user_data.active
     
     try:
-        db.commit()
-        db.refresh(user)
+        await db.commit()
     except Exception as e:
-        db.rollback()
-        print(e)
+        await db.rollback()
+        log_event("error", "user_update_failed", user_id=user_id, error=str(e))
         raise HTTPException(status_code=500, detail=f"Error al actualizar usuario: {str(e)}")
-    return user
+    forget_principal(user.email)
+    return await load_user_dto(db, user.id)
+
+def _list_by_role(role, active, page, dates, response, db, shape=None):
+    query = db.query(User).options(*query_options(User, UserDto, shape)).filter(User.role == role)
+    if active is not None:
+        query = query.filter(User.active == active)
+    query = dates.apply(query, User.created_at)
+    return paginate(query, User, page, response)
 
 @router.get("/admins", response_model=list[UserDto])
-def list_admins(db: Session = Depends(get_db), curr_user: User = Depends(get_current_user)):
+def list_admins(
+    response: Response,
+    active: bool | None = None,
+    page: PageParams = Depends(),
+    dates: DateRange = Depends(),
+    sparse: FieldParams = Depends(),
+    db: Session = Depends(get_db),
+    curr_user: User = Depends(get_current_user),
+):
     if curr_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="No tienes permiso para ver los administradores")
-    return db.query(User).filter(User.role == UserRole.ADMIN).all()
+    shape = sparse.resolve(User, UserDto)
+    return json_response(
+        list[UserDto], _list_by_role(UserRole.ADMIN, active, page, dates, response, db, shape), response, shape=shape
+    )
 
 @router.get("/teachers", response_model=list[UserDto])
-def list_teachers(db: Session = Depends(get_db)):
-    return db.query(User).filter(User.role == UserRole.TEACHER).all()
+def list_teachers(
+    request: Request,
+    response: Response,
+    active: bool | None = None,
+    page: PageParams = Depends(),
+    dates: DateRange = Depends(),
+    sparse: FieldParams = Depends(),
+    db: Session = Depends(get_db),
+):
+    shape = sparse.resolve(User, UserDto)
+    return cached_response(
+        request, response, list[UserDto], "public", [USER_LISTS],
+        lambda: _list_by_role(UserRole.TEACHER, active, page, dates, response, db, shape),
+        shape=shape,
+    )
 
 @router.get("/students", response_model=list[UserDto])
-def list_students(db: Session = Depends(get_db)):
-    return db.query(User).filter(User.role == UserRole.STUDENT).all()
\ No newline at end of file
+def list_students(
+    request: Request,
+    response: Response,
+    active: bool | None = None,
+    page: PageParams = Depends(),
+    dates: DateRange = Depends(),
+    sparse: FieldParams = Depends(),
+    db: Session = Depends(get_db),
+):
+    shape = sparse.resolve(User, UserDto)
+    return cached_response(
+        request, response, list[UserDto], "public", [USER_LISTS],
+        lambda: _list_by_role(UserRole.STUDENT, active, page, dates, response, db, shape),
+        shape=shape,
+    )
\ No newline at end of file
@@ -0,0 +1,190 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+
+from fastapi import HTTPException
+
+from config import settings
+
+# ----------------------
+# Hash de contraseñas fuera del event loop
+# ----------------------
+# bcrypt consume ~250ms de CPU por operación. Se ejecuta en un pool de hilos
+# propio (bcrypt libera el GIL) con un tope de operaciones en curso + en cola;
+# al superarlo se responde 503 en vez de acumular trabajo indefinidamente.
+# passlib se importa al primer uso para no pagarlo en el arranque.
+
+
+def _crypt_context(**options):
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], **options)
+
+
+class PasswordHasher:
+    def __init__(self, rounds: int, workers: int, queue_size: int):
+        self._context = None
+        self.rounds = rounds
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._bulk_running = False
+        self._timings = {}
+
+    @property
+    def context(self):
+        # min == max == rounds: cualquier hash con otro costo se marca para
+        # rehash al verificarse, en ambas direcciones.
+        if self._context is None:
+            self._context = _crypt_context(
+                deprecated="auto",
+                bcrypt__default_rounds=self.rounds,
+                bcrypt__min_rounds=self.rounds,
+                bcrypt__max_rounds=self.rounds,
+            )
+        return self._context
+
+    def record(self, name, elapsed):
+        with self._lock:
+            count, total, worst = self._timings.get(name, (0, 0.0, 0.0))
+            self._timings[name] = (count + 1, total + elapsed, max(worst, elapsed))
+
+    def _timed(self, name, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    @contextmanager
+    def admit(self, bulk: bool = False):
+        # Tope común de trabajo pendiente; una importación masiva cuenta como una
+        # operación más y solo puede haber una a la vez (ya ocupa todos los núcleos)
+        with self._lock:
+            if self._pending >= self.workers + self.queue_size or (bulk and self._bulk_running):
+                raise HTTPException(
+                    status_code=503,
+                    detail="Servidor ocupado, intenta de nuevo",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+            self._bulk_running = self._bulk_running or bulk
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pending -= 1
+                if bulk:
+                    self._bulk_running = False
+
+    async def _run(self, name, fn, *args):
+        with self.admit():
+            loop = asyncio.get_running_loop()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+            return await loop.run_in_executor(self._executor, self._timed, name, fn, *args)
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> tuple[bool, str | None]:
+        # Devuelve (válida, nuevo_hash); nuevo_hash != None si cambió el costo configurado
+        return await self._run("verify", self.context.verify_and_update, password, hashed)
+
+    def shutdown(self):
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rounds": self.rounds,
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "pending": self._pending,
+                "bulk_running": self._bulk_running,
+                "timings": {
+                    name: {"count": count, "avg_ms": total / count * 1000, "max_ms": worst * 1000}
+                    for name, (count, total, worst) in self._timings.items()
+                },
+            }
+
+
+# ----------------------
+# Hash masivo en procesos (importaciones de usuarios)
+# ----------------------
+# Para miles de contraseñas se reparte el trabajo en un pool de procesos con
+# un worker por núcleo; se crea al primer uso. Los procesos se lanzan con
+# "spawn": el worker de uvicorn ya tiene hilos (bcrypt, log de acceso,
+# aiosqlite) y hacer fork de un proceso con hilos puede dejar locks tomados.
+
+PROCESS_WORKERS = settings.PASSWORD_HASH_PROCESSES or os.cpu_count() or 1
+_process_pool = None
+_process_pool_lock = threading.Lock()
+_process_contexts = {}
+
+
+def _hash_chunk(passwords, rounds):
+    # Se ejecuta en el proceso hijo; el CryptContext se crea una vez por proceso
+    context = _process_contexts.get(rounds)
+    if context is None:
+        context = _process_contexts[rounds] = _crypt_context(bcrypt__default_rounds=rounds)
+    return [context.hash(password) for password in passwords]
+
+
+def _get_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=PROCESS_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _process_pool
+
+
+def shutdown_pools():
+    # Al apagar el worker: hilos de bcrypt y, si se creó, el pool de procesos
+    global _process_pool
+    password_hasher.shutdown()
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(cancel_futures=True)
+            _process_pool = None
+
+
+async def hash_passwords(passwords: list[str]) -> list[str]:
+    if not passwords:
+        return []
+    with password_hasher.admit(bulk=True):
+        pool = _get_process_pool()
+        chunk_size = max(1, len(passwords) // (PROCESS_WORKERS * 4))
+        chunks = [passwords[start:start + chunk_size] for start in range(0, len(passwords), chunk_size)]
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(pool, _hash_chunk, chunk, settings.BCRYPT_ROUNDS) for chunk in chunks
+        ))
+        password_hasher.record("bulk_hash", time.perf_counter() - start)
+    return [hashed for chunk in results for hashed in chunk]
+
+
+password_hasher = PasswordHasher(
+    rounds=settings.BCRYPT_ROUNDS,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+)
+
+
+async def hash_password(password: str) -> str:
+    return await password_hasher.hash(password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return await password_hasher.verify(plain_password, hashed_password)
@@ -0,0 +1,52 @@
+import argparse
+import os
+
+from config import settings
+
+# ----------------------
+# Lanzador de producción
+# ----------------------
+# Las migraciones se aplican una sola vez en este proceso; luego uvicorn
+# arranca N workers (uno por núcleo por defecto) y cada uno importa main:app
+# y abre sus propias engines. Este módulo no importa la app:
+# los workers se crean con spawn y vuelven a ejecutar el módulo principal.
+# La caché de respuestas en memoria es por proceso: con varios workers y sin
+# RESPONSE_CACHE_URL se desactiva para no servir respuestas ya invalidadas en
+# otro worker.
+# Uso: python server.py --workers 4 --port 8000
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor de SchoolControl")
+    parser.add_argument("--host", default=settings.HOST)
+    parser.add_argument("--port", type=int, default=settings.PORT)
+    parser.add_argument("--workers", type=int, default=settings.WEB_WORKERS, help="0 = un worker por núcleo")
+    return parser.parse_args(argv)
+
+
+def migrate():
+    import migrations
+    from database import engine
+
+    for name in migrations.upgrade(engine):
+        print(f"🛠️ Migración aplicada: {name}")
+    engine.dispose()
+
+
+def serve(argv=None):
+    import uvicorn
+
+    args = parse_args(argv)
+    workers = args.workers or os.cpu_count() or 1
+    if settings.AUTO_MIGRATE:
+        migrate()
+    os.environ["AUTO_MIGRATE"] = "false"
+    if workers > 1 and not settings.RESPONSE_CACHE_URL and settings.RESPONSE_CACHE_MAX_BYTES:
+        os.environ["RESPONSE_CACHE_MAX_BYTES"] = "0"
+        print("⚠️ Caché de respuestas desactivada: con varios workers usa RESPONSE_CACHE_URL")
+    print(f"🚀 Backend corriendo en: http://{args.host}:{args.port} ({workers} workers)")
+    uvicorn.run("main:app", host=args.host, port=args.port, workers=workers, access_log=False)
+
+
+if __name__ == "__main__":
+    serve()
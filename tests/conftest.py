@@ -0,0 +1,92 @@
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+# config.settings se lee al importar la app: el entorno de pruebas se fija antes.
+# Base nueva en un directorio temporal (el lifespan aplica las migraciones), sin
+# log de acceso y con bcrypt barato para las importaciones masivas.
+_workdir = tempfile.mkdtemp(prefix="schoolcontrol-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ["PHOTO_STORAGE_DIR"] = os.path.join(_workdir, "media")
+os.environ["ACCESS_LOG"] = "false"
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["PASSWORD_HASH_PROCESSES"] = "1"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_sequence = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_workdir, ignore_errors=True)
+
+
+def auth(email: str):
+    from routes.users import create_access_token
+
+    return {"Authorization": "Bearer " + create_access_token({"sub": email})}
+
+
+@pytest.fixture
+def school(client):
+    # Datos propios de cada prueba: un admin, un profesor con su materia, dos
+    # matriculados, uno sin matricular y dos evaluaciones (60% y 40%).
+    # Las marcas de tiempo quedan en el pasado para que el GET condicional emita ETag.
+    from database import SessionLocal
+    from models.enrollment import Enrollment
+    from models.evaluation import Evaluation
+    from models.subject import Subject
+    from models.user import User, UserRole
+
+    n = next(_sequence)
+    past = datetime.utcnow() - timedelta(hours=1)
+
+    def person(role, name):
+        return User(
+            name=f"{name} {n}", email=f"{name}{n}@test.com", idnumber=str(10**8 + next(_sequence)),
+            password="x", role=role, age=20, active=True, created_at=past, updated_at=past,
+        )
+
+    # La sesión se cierra antes de devolver: el escritor tiene una sola conexión
+    with SessionLocal() as db:
+        admin, teacher = person(UserRole.ADMIN, "admin"), person(UserRole.TEACHER, "teacher")
+        students = [person(UserRole.STUDENT, "ana"), person(UserRole.STUDENT, "beto")]
+        outsider = person(UserRole.STUDENT, "carla")
+        subject = Subject(name=f"Materia {n}", teacher=teacher, created_at=past, updated_at=past)
+        evaluations = [
+            Evaluation(name="Parcial", percentage=60, subject=subject, created_at=past, updated_at=past),
+            Evaluation(name="Final", percentage=40, subject=subject, created_at=past, updated_at=past),
+        ]
+        enrollments = [
+            Enrollment(student=student, subject=subject, active=True, enrolled_at=past, updated_at=past)
+            for student in students
+        ]
+        db.add_all([admin, outsider, *evaluations, *enrollments])
+        db.commit()
+        return SimpleNamespace(
+            subject=subject.id,
+            evaluations=[evaluation.id for evaluation in evaluations],
+            students=[student.id for student in students],
+            outsider=outsider.id,
+            admin=auth(admin.email),
+            teacher=auth(teacher.email),
+            student=auth(students[0].email),
+            stranger=auth(outsider.email),
+            idnumbers={student.id: student.idnumber for student in [*students, outsider]},
+        )
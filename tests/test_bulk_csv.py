@@ -0,0 +1,71 @@
+import asyncio
+import csv
+import io
+import os
+import sys
+
+import pytest
+from fastapi import HTTPException
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings  # noqa: E402
+from routes.bulk import read_csv_records  # noqa: E402
+
+
+class _Body:
+    # Simula request.stream() entregando el cuerpo en trozos de `size` bytes
+    def __init__(self, data: bytes, size: int):
+        self.data = data
+        self.size = size
+
+    async def stream(self):
+        for start in range(0, len(self.data), self.size):
+            yield self.data[start:start + self.size]
+
+
+def _read(data: bytes, size: int = 3, required_any=("email",)):
+    return asyncio.run(read_csv_records(_Body(data, size), required_any))
+
+
+CSV = (
+    "\ufeffEmail,Name,Notes\r\n"
+    "a@x.com,O\"Brien,uno\r\n"
+    "\"b@x.com\",\"Pérez, Ana\",\"línea 1\r\nlínea 2\"\r\n"
+    "c@x.com,Ca\"rl,dos\r\n"
+    "\r\n"
+    "d@x.com,Dana,\"dice \"\"hola\"\"\"\r\n"
+    "e@x.com,Eve,fin"
+)
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 4096])
+def test_quoted_newlines_and_stray_quotes_keep_every_row(size):
+    records = _read(CSV.encode(), size)
+    expected = list(csv.reader(io.StringIO(CSV.lstrip("\ufeff"))))[1:]
+    expected = [row for row in expected if row]
+
+    assert [row for row, _ in records] == [1, 2, 3, 4, 5]
+    assert [record["email"] for _, record in records] == [row[0] for row in expected]
+    assert records[0][1]["name"] == 'O"Brien'
+    assert records[1][1] == {"email": "b@x.com", "name": "Pérez, Ana", "notes": "línea 1\r\nlínea 2"}
+    assert records[2][1]["name"] == 'Ca"rl'
+    assert records[3][1]["notes"] == 'dice "hola"'
+
+
+def test_missing_required_column_is_rejected():
+    with pytest.raises(HTTPException) as error:
+        _read(b"name\nAna\n")
+    assert error.value.status_code == 400
+
+
+def test_size_and_row_limits(monkeypatch):
+    monkeypatch.setattr(settings, "BULK_CSV_MAX_ROWS", 2)
+    with pytest.raises(HTTPException) as error:
+        _read(b"email\na@x.com\nb@x.com\nc@x.com\n")
+    assert error.value.status_code == 413
+
+    monkeypatch.setattr(settings, "BULK_CSV_MAX_BYTES", 10)
+    with pytest.raises(HTTPException) as error:
+        _read(b"email\na@x.com\nb@x.com\n")
+    assert error.value.status_code == 413
@@ -0,0 +1,38 @@
+def test_etag_revalidates_and_put_invalidates(client, school):
+    path = f"/evaluations/subject/{school.subject}"
+
+    first = client.get(path, headers=school.student)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    revalidated = client.get(path, headers={**school.student, "If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+
+    # La respuesta en caché es compartida por los usuarios autorizados de la materia
+    cached = client.get(path, headers=school.teacher)
+    assert cached.headers["x-cache"] == "HIT"
+    assert cached.json() == first.json()
+
+    parcial = school.evaluations[0]
+    response = client.put(f"/evaluations/{parcial}", json={"name": "Parcial corregido"}, headers=school.teacher)
+    assert response.status_code == 200, response.text
+
+    changed = client.get(path, headers={**school.student, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["x-cache"] == "MISS"
+    assert changed.headers.get("etag") != etag
+    assert {evaluation["id"]: evaluation["name"] for evaluation in changed.json()}[parcial] == "Parcial corregido"
+
+
+def test_subject_cache_is_invalidated_after_put(client, school):
+    path = f"/subjects/{school.subject}"
+    assert client.get(path, headers=school.student).headers["x-cache"] == "MISS"
+    assert client.get(path, headers=school.student).headers["x-cache"] == "HIT"
+
+    response = client.put(path, json={"description": "Nueva descripción"}, headers=school.admin)
+    assert response.status_code == 200, response.text
+
+    refreshed = client.get(path, headers=school.student)
+    assert refreshed.headers["x-cache"] == "MISS"
+    assert refreshed.json()["description"] == "Nueva descripción"
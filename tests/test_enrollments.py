@@ -0,0 +1,73 @@
+CSV = {"Content-Type": "text/csv"}
+
+
+def test_scope_follows_enrollment_changes(client, school):
+    path = f"/evaluations/subject/{school.subject}"
+    assert client.get(path, headers=school.stranger).status_code == 403
+
+    response = client.post(
+        "/enrollments/", json={"student_id": school.outsider, "subject_id": school.subject}, headers=school.teacher
+    )
+    assert response.status_code == 200, response.text
+    assert client.get(path, headers=school.stranger).status_code == 200
+
+    response = client.delete(f"/enrollments/{response.json()['id']}", headers=school.teacher)
+    assert response.status_code == 200, response.text
+    assert client.get(path, headers=school.stranger).status_code == 403
+
+
+def test_csv_import_resolves_by_id_or_idnumber(client, school):
+    ana = school.students[0]
+    body = (
+        "student_id,idnumber\n"
+        f"{ana},\n"
+        f"abc,{school.idnumbers[school.outsider]}\n"
+        "xyz,\n"
+        ",000\n"
+    )
+    response = client.post(
+        f"/enrollments/subject/{school.subject}/bulk/csv", content=body.encode(), headers={**school.teacher, **CSV}
+    )
+    assert response.status_code == 200, response.text
+    result = response.json()
+
+    assert result["created"] == [school.outsider]
+    assert result["skipped"] == [ana]
+    assert [(r["row"], r["reference"], r["detail"]) for r in result["rejected"]] == [
+        (3, None, "Fila sin student_id ni idnumber válido"),
+        (4, "000", "Estudiante no encontrado"),
+    ]
+    assert client.get(f"/evaluations/subject/{school.subject}", headers=school.stranger).status_code == 200
+
+
+def test_csv_import_requires_managing_the_subject(client, school):
+    response = client.post(
+        f"/enrollments/subject/{school.subject}/bulk/csv", content=b"student_id\n1\n", headers={**school.student, **CSV}
+    )
+    assert response.status_code == 403
+    response = client.post("/enrollments/subject/999999/bulk/csv", content=b"student_id\n1\n", headers={**school.admin, **CSV})
+    assert response.status_code == 404
+
+
+def test_users_csv_import(client, school):
+    body = (
+        "name,idnumber,email,age,role,password\n"
+        "Dora,900000001,dora@test.com,21,student,secreto1\n"
+        "Eva,900000002,no-es-email,22,student,secreto2\n"
+        "Dora bis,900000003,dora@test.com,23,student,secreto3\n"
+        "Fede,900000004,fede@test.com,24,teacher,secreto4\n"
+    )
+    response = client.post("/users/bulk/csv", content=body.encode(), headers={**school.admin, **CSV})
+    assert response.status_code == 200, response.text
+    result = response.json()
+
+    assert [(created["row"], created["email"]) for created in result["created"]] == [(1, "dora@test.com"), (4, "fede@test.com")]
+    assert [rejected["row"] for rejected in result["rejected"]] == [2, 3]
+
+    login = client.post("/users/login", json={"username": "dora@test.com", "password": "secreto1"})
+    assert login.status_code == 200, login.text
+    assert login.json()["user"]["role"] == "student"
+
+    again = client.post("/users/bulk/csv", content=body.encode(), headers={**school.admin, **CSV}).json()
+    assert again["created"] == []
+    assert [rejected["detail"] for rejected in again["rejected"] if rejected["row"] in (1, 4)] == ["Email ya registrado"] * 2
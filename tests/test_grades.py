@@ -0,0 +1,63 @@
+def _bulk(client, school, evaluation_id, items):
+    response = client.post(f"/grades/evaluation/{evaluation_id}/bulk", json=items, headers=school.teacher)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _final_grades(client, school):
+    response = client.get(f"/final-grades/subject/{school.subject}", headers=school.teacher)
+    assert response.status_code == 200, response.text
+    return {row["student_id"]: (row["weighted_average"], row["percentage_covered"]) for row in response.json()}
+
+
+def test_bulk_upsert_returns_one_result_per_row_in_order(client, school):
+    ana, beto = school.students
+    parcial = school.evaluations[0]
+
+    results = _bulk(client, school, parcial, [
+        {"student_id": ana, "score": 4.0},
+        {"student_id": beto, "score": 3.0},
+        {"student_id": ana, "score": 2.0},
+        {"student_id": school.outsider, "score": 5.0},
+    ])
+
+    assert [(r["row"], r["student_id"], r["status"]) for r in results] == [
+        (1, ana, "rejected"),
+        (2, beto, "created"),
+        (3, ana, "rejected"),
+        (4, school.outsider, "rejected"),
+    ]
+    assert results[0]["detail"] == results[2]["detail"] == "Estudiante repetido en la solicitud"
+    assert results[3]["detail"] == "El estudiante no está matriculado en la materia"
+    assert results[1]["grade_id"] is not None
+
+    again = _bulk(client, school, parcial, [{"student_id": beto, "score": 4.5}])
+    assert again == [{"row": 1, "student_id": beto, "status": "updated", "grade_id": results[1]["grade_id"], "detail": None}]
+    grade = client.get(f"/grades/{results[1]['grade_id']}", headers=school.teacher).json()
+    assert grade["score"] == 4.5
+
+
+def test_final_grades_follow_grade_and_evaluation_changes(client, school):
+    ana = school.students[0]
+    parcial, final = school.evaluations
+
+    _bulk(client, school, parcial, [{"student_id": ana, "score": 4.0}])
+    assert _final_grades(client, school) == {ana: (4.0, 60)}
+
+    [created] = _bulk(client, school, final, [{"student_id": ana, "score": 3.0}])
+    assert _final_grades(client, school)[ana] == (3.6, 100)
+
+    response = client.put(f"/evaluations/{final}", json={"percentage": 60}, headers=school.teacher)
+    assert response.status_code == 200, response.text
+    assert _final_grades(client, school)[ana] == (3.5, 120)
+
+    response = client.put(f"/grades/{created['grade_id']}", json={"score": 5.0}, headers=school.teacher)
+    assert response.status_code == 200, response.text
+    assert _final_grades(client, school)[ana] == (4.5, 120)
+
+    response = client.delete(f"/grades/{created['grade_id']}", headers=school.teacher)
+    assert response.status_code == 200, response.text
+    assert _final_grades(client, school)[ana] == (4.0, 60)
+
+    student_view = client.get("/final-grades/me", headers=school.student).json()
+    assert [(row["subject_id"], row["weighted_average"]) for row in student_view] == [(school.subject, 4.0)]
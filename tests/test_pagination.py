@@ -0,0 +1,37 @@
+import os
+import sys
+
+from fastapi import Response
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models  # noqa: E402,F401  registra todas las tablas
+from database import Base  # noqa: E402
+from models.subject import Subject  # noqa: E402
+from routes.pagination import NEXT_CURSOR_HEADER, PageParams, paginate  # noqa: E402
+
+
+def _walk(db, order_by, limit):
+    ids, cursor = [], None
+    while True:
+        response = Response()
+        rows = paginate(db.query(Subject), Subject, PageParams(limit=limit, cursor=cursor, order_by=order_by), response)
+        ids += [row.id for row in rows]
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return ids
+
+
+def test_updated_at_cursor_walks_rows_stamped_in_the_same_second():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        # Una sola ráfaga: todas las filas comparten el CURRENT_TIMESTAMP (resolución de segundos)
+        db.execute(insert(Subject), [{"name": f"Materia {i}"} for i in range(5)])
+        db.commit()
+        assert len({subject.updated_at for subject in db.query(Subject)}) == 1
+
+        assert _walk(db, "updated_at", 2) == [1, 2, 3, 4, 5]
+        assert _walk(db, "id", 2) == [1, 2, 3, 4, 5]
@@ -0,0 +1,69 @@
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+from pydantic import TypeAdapter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.serialization import build_school  # noqa: E402
+from models.enrollment import Enrollment  # noqa: E402
+from models.evaluation import Evaluation  # noqa: E402
+from models.grade import Grade  # noqa: E402
+from models.subject import Subject  # noqa: E402
+from models.user import User  # noqa: E402
+from routes.dtos import (  # noqa: E402
+    EnrollmentBaseDto,
+    EnrollmentDto,
+    EvaluationBaseDto,
+    EvaluationDto,
+    GradeBaseDto,
+    GradeDto,
+    SubjectBaseDto,
+    SubjectDto,
+    UserBaseDto,
+    UserDto,
+)
+from routes.serialization import dumps, serializer  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def school():
+    school = build_school(subjects=2, students_per_subject=3, evaluations_per_subject=2)
+    # Valores que pydantic transforma: email con dominio en mayúsculas, rol crudo, fecha con zona UTC
+    student = school[User][0]
+    student.email = "Ana.Perez@MAIL.COM"
+    student.role = "student"
+    student.updated_at = datetime(2025, 1, 2, 9, 30, tzinfo=timezone.utc)
+    return school
+
+
+DTOS = [
+    (UserBaseDto, User),
+    (UserDto, User),
+    (SubjectBaseDto, Subject),
+    (SubjectDto, Subject),
+    (EvaluationBaseDto, Evaluation),
+    (EvaluationDto, Evaluation),
+    (GradeBaseDto, Grade),
+    (GradeDto, Grade),
+    (EnrollmentBaseDto, Enrollment),
+    (EnrollmentDto, Enrollment),
+]
+
+
+@pytest.mark.parametrize("dto, model", DTOS, ids=[dto.__name__ for dto, _ in DTOS])
+def test_compiled_serializer_matches_pydantic(school, dto, model):
+    rows = school[model]
+    adapter = TypeAdapter(list[dto])
+    expected = adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+    assert dumps(serializer(list[dto])(rows)) == expected
+    assert dumps(serializer(dto)(rows[0])) == TypeAdapter(dto).dump_json(dto.model_validate(rows[0], from_attributes=True))
+
+
+def test_email_is_normalized_like_response_model(school):
+    body = serializer(UserBaseDto)(school[User][0])
+    assert body["email"] == "Ana.Perez@mail.com"
+    assert body["role"] == "student"